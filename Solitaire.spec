@@ -1,16 +1,20 @@
 # -*- mode: python ; coding: utf-8 -*-
+import argparse
 
+# Build options, given after "--": pyinstaller Solitaire.spec -- --onedir
+parser = argparse.ArgumentParser()
+parser.add_argument("--onedir", action="store_true",
+                    help="build a folder with the executable, it starts without unpacking itself to a temp folder")
+options = parser.parse_args()
 
 a = Analysis(
     ['game\\game.py'],
     pathex=[],
     binaries=[],
     datas=[
-        ('sprites/clubs/*.jpg', 'sprites/clubs'),
-        ('sprites/cover/*.jpg', 'sprites/cover'),
-        ('sprites/diamonds/*.jpg', 'sprites/diamonds'),
-        ('sprites/hearts/*.jpg', 'sprites/hearts'),
-        ('sprites/spades/*.jpg', 'sprites/spades'),
+        ('sprites/atlas/cards.png', 'sprites/atlas'),
+        ('sprites/atlas/cards.json', 'sprites/atlas'),
+        ('deals/deals.bin', 'deals'),
         ('sprites/screens/*.jpg', 'sprites/screens'),
         ('images/game_icon.ico', 'images/')
     ],
@@ -24,12 +28,7 @@ a = Analysis(
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
+exe_options = dict(
     name='Solitaire',
     debug=False,
     bootloader_ignore_signals=False,
@@ -45,3 +44,32 @@ exe = EXE(
     entitlements_file=None,
     icon=['images\\game_icon.ico'],
 )
+
+if options.onedir:
+    # dist/Solitaire/Solitaire.exe next to its libraries and resources
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        **exe_options,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        name='Solitaire',
+    )
+else:
+    # A single dist/Solitaire.exe, unpacked to a temp folder on every start
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        **exe_options,
+    )
@@ -0,0 +1,123 @@
+'''
+Solve a range of deals of the Solitaire Game on all the cores
+
+Every seed is solved in Normal and/or Hard mode by a pool of processes.
+The seeds are sent to the processes in small chunks and every deal has
+its own node and time limit, so a deal that takes long only holds back
+its own chunk. Results are written to a CSV or JSONL file as soon as a
+chunk is done.
+'''
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from solver import solve, deal_for_seed, MAX_NODES
+
+# Columns of the results
+FIELDS = ['seed', 'mode', 'status', 'seconds', 'nodes', 'moves']
+
+# Modes to solve, by name
+MODES = {'normal': [False], 'hard': [True], 'both': [False, True]}
+
+
+def solve_chunk(task):
+    '''Solve the seeds of a chunk, runs in a worker process'''
+    first_seed, last_seed, hard_modes, max_nodes, time_limit = task
+    rows = []
+    for seed in range(first_seed, last_seed):
+        deal = deal_for_seed(seed)
+        for hard_mode in hard_modes:
+            result = solve(deal, hard_mode, max_nodes=max_nodes, time_limit=time_limit)
+            rows.append({
+                'seed': seed,
+                'mode': 'hard' if hard_mode else 'normal',
+                'status': result.status,
+                'seconds': round(result.seconds, 4),
+                'nodes': result.nodes,
+                'moves': len(result.moves),
+            })
+    return rows
+
+
+def chunks(start, count, chunk_size, hard_modes, max_nodes, time_limit):
+    '''Split the seeds into tasks for the workers'''
+    for first_seed in range(start, start + count, chunk_size):
+        last_seed = min(first_seed + chunk_size, start + count)
+        yield first_seed, last_seed, hard_modes, max_nodes, time_limit
+
+
+class ResultWriter:
+    '''Write result rows to a CSV file, or to a JSONL file for a .jsonl name'''
+
+    def __init__(self, path):
+        '''Open the output file'''
+        self.file = open(path, 'w', newline='')
+        self.jsonl = path.endswith('.jsonl')
+        if not self.jsonl:
+            self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+            self.writer.writeheader()
+
+    def write(self, rows):
+        '''Write the rows of a chunk'''
+        if self.jsonl:
+            for row in rows:
+                self.file.write(json.dumps(row) + '\n')
+        else:
+            self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        '''Close the output file'''
+        self.file.close()
+
+
+def main():
+    '''Solve a range of seeds from the command line'''
+    parser = argparse.ArgumentParser(description="Find out which Solitaire deals can be won")
+    parser.add_argument("--start", type=int, default=0, help="first seed")
+    parser.add_argument("--count", type=int, default=1000, help="number of seeds")
+    parser.add_argument("--mode", choices=sorted(MODES), default='both')
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=4, help="seeds sent to a worker at once")
+    parser.add_argument("--max-nodes", type=int, default=MAX_NODES, help="node limit for each deal")
+    parser.add_argument("--time-limit", type=float, default=10.0, help="time limit for each deal, in seconds")
+    parser.add_argument("--progress", type=float, default=5.0, help="seconds between progress reports")
+    parser.add_argument("--output", default="results.csv", help="CSV file, or JSONL if it ends with .jsonl")
+    args = parser.parse_args()
+
+    hard_modes = MODES[args.mode]
+    total = args.count * len(hard_modes)
+    tasks = chunks(args.start, args.count, args.chunk_size, hard_modes, args.max_nodes, args.time_limit)
+
+    writer = ResultWriter(args.output)
+    counts = {'win': 0, 'loss': 0, 'unknown': 0}
+    done = 0
+    start = time.perf_counter()
+    next_report = start + args.progress
+
+    with multiprocessing.Pool(args.workers) as pool:
+        for rows in pool.imap_unordered(solve_chunk, tasks):
+            writer.write(rows)
+            for row in rows:
+                counts[row['status']] += 1
+            done += len(rows)
+
+            now = time.perf_counter()
+            if now >= next_report or done == total:
+                next_report = now + args.progress
+                rate = done / (now - start)
+                print(f"{done}/{total} deals, {rate:.1f} deals/s, "
+                      f"win {counts['win']} loss {counts['loss']} unknown {counts['unknown']}",
+                      file=sys.stderr)
+
+    writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"Solved {done} deals in {elapsed:.1f}s with {args.workers} workers, results in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+'''
+Benchmarks of the Solitaire Game
+
+Plays scripted sessions on the real StartView, SolitaireView and
+WinningView: dealing (until the cards are on the table), leaving a game
+open with nothing moving, going through the deck in Normal and Hard Mode,
+dragging a long run of cards around and winning a deal with double-clicks
+to the top piles and drags between piles. Every handler call and every
+frame (on_update, on_draw, flip and waiting for the GPU) is timed.
+
+Starting the game is timed too, in a new process every time, until its
+first frame is on screen (game.py --startup-report).
+
+It runs without a display on a plain Linux box (pyglet headless, Mesa),
+or in a hidden window with --window. The results can be saved as a
+baseline, and the next runs compared with it:
+
+    python game/benchmark.py --save-baseline
+    python game/benchmark.py --threshold 0.25
+
+All the benchmarks are run RUNS times, and every operation is reported
+with the median of the percentiles of the runs, so one run slowed down by
+something else on the machine does not count. The code is slower than the
+baseline when the median 95th percentile of an operation grows by more
+than the threshold (and by more than MIN_SLOWDOWN milliseconds, the noise
+of a quick operation): it has to be slower in most of the runs.
+'''
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import resources
+
+# Deal played by the benchmarks, the solver wins it in both modes
+DEAL_NUMBER = 1
+
+# Default baseline, in the benchmarks folder of the repository
+BASELINE_PATH = os.path.join("benchmarks", "baseline.json")
+
+# A slowdown under this many milliseconds is never a regression
+MIN_SLOWDOWN = 0.5
+
+# Runs of all the benchmarks, the median of every percentile is kept
+RUNS = 3
+
+FRAME_TIME = 1 / 60
+
+
+class Timings:
+    '''Durations of the operations of the benchmarks, by name'''
+
+    def __init__(self):
+        '''Initialize empty timings'''
+        self.durations = {}
+
+    def add(self, name, seconds):
+        '''Add the duration of one operation'''
+        self.durations.setdefault(name, []).append(seconds)
+
+    def measure(self, name, function, *args):
+        '''Call a function and add how long it took'''
+        start = time.perf_counter()
+        result = function(*args)
+        self.add(name, time.perf_counter() - start)
+        return result
+
+    def summary(self):
+        '''Return the count and percentiles of every operation, in milliseconds'''
+        # Taken like in the overlay of the profiler, arcade is loaded by now
+        from profiler import percentile
+        summary = {}
+        for name, durations in self.durations.items():
+            ordered = sorted(durations)
+            summary[name] = {
+                'count': len(ordered),
+                'p50': round(percentile(ordered, 0.50) * 1000, 3),
+                'p95': round(percentile(ordered, 0.95) * 1000, 3),
+                'max': round(ordered[-1] * 1000, 3),
+            }
+            if name.endswith(" frame"):
+                summary[name]['fps'] = round(len(ordered) / sum(ordered), 1)
+        return summary
+
+
+class Session:
+    '''Drives the views shown in a window like a player would'''
+
+    def __init__(self, window, timings):
+        '''Initialize the session'''
+        self.window = window
+        self.timings = timings
+
+    @property
+    def view(self):
+        '''The view shown in the window'''
+        return self.window.current_view
+
+    def frame(self, name):
+        '''Update, draw and show one frame of the view shown, and wait for the GPU'''
+        view = self.view
+        start = time.perf_counter()
+        view.on_update(FRAME_TIME)
+        view.on_draw()
+        self.window.flip()
+        self.window.ctx.finish()
+        self.timings.add(f"{name} frame", time.perf_counter() - start)
+
+    def click(self, name, x, y, double=False):
+        '''Click on a point, a double click if asked'''
+        import arcade
+        view = self.view
+        if not double:
+            # The last click was long ago
+            view.last_click_time = 0
+        self.timings.measure(name, view.on_mouse_press, x, y, arcade.MOUSE_BUTTON_LEFT, 0)
+        view.on_mouse_release(x, y, arcade.MOUSE_BUTTON_LEFT, 0)
+
+    def drag(self, name, path, steps, frame_name):
+        '''Drag along the points of a path, with a frame after every mouse move'''
+        import arcade
+        view = self.view
+        view.last_click_time = 0
+        x, y = path[0]
+        self.timings.measure(f"pick up ({name})", view.on_mouse_press, x, y, arcade.MOUSE_BUTTON_LEFT, 0)
+        for end_x, end_y in path[1:]:
+            dx = (end_x - x) / steps
+            dy = (end_y - y) / steps
+            for _ in range(steps):
+                x += dx
+                y += dy
+                self.timings.measure("mouse motion", view.on_mouse_motion, x, y, dx, dy)
+                self.frame(frame_name)
+        self.timings.measure(f"drop ({name})", view.on_mouse_release, x, y, arcade.MOUSE_BUTTON_LEFT, 0)
+
+
+def new_game(session, hard_mode):
+    '''Show the benchmark deal in a new game'''
+    from game import SolitaireView
+    view = SolitaireView()
+    view.setup(hard_mode, deal_number=DEAL_NUMBER)
+    session.window.show_view(view)
+    return view
+
+
+def bench_deal(session, count=20):
+    '''Start games from the start screen'''
+    import arcade
+    from game import StartView
+    for _ in range(count):
+        start_view = StartView()
+        session.window.show_view(start_view)
+        # The game can be started once the saved game and the statistics are read
+        session.frame("start screen")
+        while not start_view.saved_game_checked:
+            session.frame("start screen")
+        start_view.deal_number = str(DEAL_NUMBER)
+        session.timings.measure("deal", start_view.on_key_press, arcade.key.SPACE, 0)
+        session.frame("first")
+        while session.view.tweens.active:
+            session.frame("deal animation")
+        session.view.on_hide_view()
+
+
+def bench_stock(session, hard_mode, cycles=3):
+    '''Go through the deck a few times'''
+    from model import RECYCLE
+    view = new_game(session, hard_mode)
+    mode = "hard" if hard_mode else "normal"
+    x, y = view.pile_mat_list[0].position
+    done = 0
+    while done < cycles:
+        move = view.game.draw_move()
+        if move.kind == RECYCLE:
+            done += 1
+        session.click(f"stock click ({mode})", x, y)
+        session.frame(f"stock {mode}")
+    view.on_hide_view()
+
+
+def bench_idle(session, frames=600):
+    '''Leave a game open with nothing moving, only the timer changes'''
+    view = new_game(session, False)
+    while view.tweens.active:
+        session.frame("deal animation")
+    drawn = view.board_layer.renders
+    for _ in range(frames):
+        session.frame("idle")
+    if view.board_layer.renders != drawn:
+        raise RuntimeError("the table was drawn again while nothing moved")
+    view.on_hide_view()
+
+
+def winning_moves(hard_mode):
+    '''Return the moves that win the benchmark deal'''
+    from deals import deal_for_seed
+    from solver import solve, WIN
+    result = solve(deal_for_seed(DEAL_NUMBER), hard_mode, max_nodes=200_000, time_limit=30)
+    if result.status != WIN:
+        raise RuntimeError(f"the solver did not win deal {DEAL_NUMBER}")
+    return result.moves
+
+
+def card_point(view, code):
+    '''Return the top edge of a card where it is in the game, it may still be sliding there'''
+    pile_index = view.game.get_pile_for_card(code)
+    x, y = view.grid.card_position(pile_index, view.game.piles[pile_index].index(code))
+    # No other card covers the top edge
+    return x, y + view.grid.card_half_height - 5
+
+
+def longest_run(game):
+    '''Return the pile and position of the longest run of face up cards of the play piles'''
+    from model import PLAY_PILE_1, PLAY_PILE_7
+    best = (0, None, None)
+    for pile_index in range(PLAY_PILE_1, PLAY_PILE_7 + 1):
+        pile = game.piles[pile_index]
+        for position, card in enumerate(pile):
+            if game.is_face_up(card):
+                best = max(best, (len(pile) - position, pile_index, position))
+                break
+    return best
+
+
+def bench_drag(session, moves, drags=10):
+    '''Drag the longest run of cards found while winning the deal around the table'''
+    from model import SolitaireGame
+    from deals import deal_for_seed
+    game = SolitaireGame(False)
+    game.deal(deal_for_seed(DEAL_NUMBER))
+    best = (0, 0)
+    for i, move in enumerate(moves):
+        game.apply(move)
+        length = longest_run(game)[0]
+        if length > best[0]:
+            best = (length, i + 1)
+
+    # Play up to the position with the longest run
+    view = new_game(session, False)
+    for move in moves[:best[1]]:
+        view.apply_move(move)
+    length, pile_index, position = longest_run(view.game)
+    start = card_point(view, view.game.piles[pile_index][position])
+    for i in range(drags):
+        # Around the table and back where it came from, it goes back in place
+        corner = (start[0] + 300 * (-1) ** i, start[1] - 200)
+        session.drag(f"{length} cards", [start, corner, start], 15, "drag")
+        session.frame("drag")
+    view.on_hide_view()
+
+
+def bench_play(session, moves, hard_mode):
+    '''Win the deal with the mouse, then watch the fireworks'''
+    from model import SolitaireGame, DRAW, RECYCLE, FLIP, is_top_pile
+    from deals import deal_for_seed
+    view = new_game(session, hard_mode)
+    mode = "hard" if hard_mode else "normal"
+    stock = view.pile_mat_list[0].position
+
+    # The moves of the solver are made on a copy of the game, a double
+    # click may put a card on another empty top pile than the solver did
+    solver_game = SolitaireGame(hard_mode)
+    solver_game.deal(deal_for_seed(DEAL_NUMBER))
+    for move in moves:
+        if view.auto_moves or view.game.is_won():
+            break
+        if move.kind in (DRAW, RECYCLE):
+            session.click(f"stock click ({mode})", *stock)
+        elif move.kind == FLIP:
+            session.click("flip", *card_point(view, view.game.top_card(move.source)))
+        else:
+            # The cards of the last moves may still be sliding, the points
+            # are where the cards are in the game
+            point = card_point(view, solver_game.piles[move.source][-move.count])
+            if is_top_pile(move.target) and move.count == 1:
+                session.click("click", *point)
+                session.click("double click to top pile", *point, double=True)
+            else:
+                # Drop the card right on the target
+                top_card = solver_game.top_card(move.target)
+                if top_card is None:
+                    x, y = view.pile_mat_list[move.target].position
+                    end = x, y + view.grid.card_half_height - 5
+                else:
+                    end = card_point(view, top_card)
+                session.drag("move", [point, end], 4, f"play {mode}")
+        solver_game.apply(move)
+        session.frame(f"play {mode}")
+
+    while view.auto_moves or view.tweens.active:
+        session.frame("auto-complete")
+    if not view.game.is_won():
+        raise RuntimeError(f"the scripted game of deal {DEAL_NUMBER} was not won")
+
+    # The winning screen is shown after the last card
+    for _ in range(300):
+        session.frame("winning screen")
+
+
+def bench_startup(timings, headless, count=5):
+    '''Start the game in a new process until its first frame is on screen'''
+    env = dict(os.environ, PYGLET_HEADLESS="1" if headless else "")
+    command = [sys.executable, os.path.join(os.path.dirname(__file__), "game.py"), "--startup-report"]
+    for _ in range(count):
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, env=env, text=True)
+        # The game prints "Startup: first frame after N ms (...)" and goes on
+        for line in process.stdout:
+            if line.startswith("Startup:"):
+                timings.add("startup (process)", time.perf_counter() - start)
+                timings.add("startup (first frame)", float(line.split()[4]) / 1000)
+                break
+        else:
+            raise RuntimeError(f"the game ended before its first frame ({process.wait()})")
+        process.kill()
+        process.wait()
+
+
+def run(session):
+    '''Run all the benchmarks'''
+    bench_deal(session)
+    bench_idle(session)
+    for hard_mode in (False, True):
+        bench_stock(session, hard_mode)
+    normal_moves = winning_moves(False)
+    bench_drag(session, normal_moves)
+    bench_play(session, normal_moves, False)
+    bench_play(session, winning_moves(True), True)
+
+
+def combine(summaries):
+    '''Return the summary of several runs, with the median of the percentiles of every run'''
+    combined = {}
+    for name in summaries[0]:
+        results = [summary[name] for summary in summaries if name in summary]
+        combined[name] = {
+            'count': sum(result['count'] for result in results),
+            'p50': round(statistics.median(result['p50'] for result in results), 3),
+            'p95': round(statistics.median(result['p95'] for result in results), 3),
+            'max': max(result['max'] for result in results),
+            'runs p95': [result['p95'] for result in results],
+        }
+        if 'fps' in results[0]:
+            combined[name]['fps'] = round(statistics.median(result['fps'] for result in results), 1)
+    return combined
+
+
+def compare(summary, baseline, threshold):
+    '''Return the lines of the operations slower than the baseline'''
+    regressions = []
+    for name, result in summary.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        slowdown = result['p95'] - before['p95']
+        if slowdown > MIN_SLOWDOWN and result['p95'] > before['p95'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95']:.2f}ms -> {result['p95']:.2f}ms")
+    return regressions
+
+
+def main():
+    '''Run the benchmarks from the command line'''
+    parser = argparse.ArgumentParser(description="Benchmark the Solitaire Game with scripted sessions")
+    parser.add_argument("--window", action="store_true", help="use a hidden window instead of headless rendering")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="slowdown of the 95th percentile that is a regression (0.25 is 25%%)")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--runs", type=int, default=RUNS, help=f"runs of all the benchmarks (default {RUNS})")
+    args = parser.parse_args()
+
+    # Every run starts the game in new processes first
+    runs = [Timings() for _ in range(args.runs)]
+    for timings in runs:
+        bench_startup(timings, not args.window)
+
+    # pyglet reads its options when arcade is first imported
+    import pyglet
+    pyglet.options["headless"] = not args.window
+    from game import SCREEN_WIDTH, SCREEN_HEIGHT, TITLE
+    from pacing import PacedWindow
+    from stats import close_stats
+    from save import close_autosaver
+
+    # The replays, statistics and saves of the scripted games are not kept with the player's
+    with tempfile.TemporaryDirectory() as folder:
+        resources.USER_DATA_FOLDER = folder
+        window = PacedWindow(SCREEN_WIDTH, SCREEN_HEIGHT, TITLE, visible=False)
+        for timings in runs:
+            run(Session(window, timings))
+        close_stats()
+        close_autosaver()
+    summary = combine([timings.summary() for timings in runs])
+    results = {
+        'renderer': window.ctx.info.RENDERER,
+        'python': platform.python_version(),
+        'runs': args.runs,
+        'results': summary,
+    }
+
+    print(f"Median of {args.runs} runs")
+    print(f"{'operation':<36}{'count':>7}{'p50':>9}{'p95':>9}{'max':>9}{'fps':>8}   p95 of every run")
+    for name in sorted(summary):
+        result = summary[name]
+        fps = f"{result['fps']:>8.1f}" if 'fps' in result else " " * 8
+        runs_p95 = " ".join(f"{p95:.2f}" for p95 in result['runs p95'])
+        print(f"{name:<36}{result['count']:>7}{result['p50']:>9.2f}{result['p95']:>9.2f}{result['max']:>9.2f}{fps}"
+              f"   {runs_p95}")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"Saved the baseline to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline in {args.baseline}, save one with --save-baseline")
+        return
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline['renderer'] != results['renderer']:
+        print(f"The baseline was measured on {baseline['renderer']}, not {results['renderer']}")
+    regressions = compare(summary, baseline['results'], args.threshold)
+    if regressions:
+        print(f"Slower than the baseline (threshold {args.threshold:.0%}):")
+        for line in regressions:
+            print(f"    {line}")
+        sys.exit(1)
+    print(f"No regression against the baseline (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,49 +3,157 @@ Card class for Solitaire Game
 '''
 
 import arcade
+import json
 import os
-import sys
+import threading
+import PIL.Image
+from resources import resource_path
+from model import CARD_VALUES, CARD_SUITS, encode_card
 
-# Function to get the correct path to resources
-def resource_path(relative_path):
-    """ Get the absolute path to the resource, works for dev and PyInstaller """
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
+# Packed image with all the cards, built by other_needed_programs/build_atlas.py
+ATLAS_IMAGE = resource_path("sprites/atlas/cards.png")
+ATLAS_INDEX = resource_path("sprites/atlas/cards.json")
 
-    return os.path.join(base_path, relative_path)
+# Name of the cover in the atlas, cards use "<suit folder>/<value>"
+COVER = "cover/cover"
 
-FACE_DOWN_IMAGE = resource_path("sprites/cover/cover.jpg")
+def card_name(suit, value):
+    '''Name of the face up image for a card'''
+    return f"{suit.lower()}/{value}"
+
+# Rectangles of every card in the atlas, read on first use
+_atlas_rects = None
+
+def atlas_rects():
+    '''Return the atlas index, empty if the atlas was not built'''
+    global _atlas_rects
+    if _atlas_rects is None:
+        _atlas_rects = {}
+        if os.path.exists(ATLAS_INDEX):
+            with open(ATLAS_INDEX) as index_file:
+                _atlas_rects = json.load(index_file)["cards"]
+    return _atlas_rects
+
+# Textures shared by all the cards, loaded once and kept for the whole run
+_textures = {}
+
+# Number of textures made since the last reset, the profiler shows it
+_texture_loads = 0
+
+# Card images decoded in memory by the background loader, by name
+_decoded = {}
+_loader = None
+
+# Textures sent to the GPU in every frame of the start screen
+UPLOAD_SLICE = 8
+
+def texture_names():
+    '''Names of the cover and of the 52 faces'''
+    return [COVER] + [card_name(suit, value) for suit in CARD_SUITS for value in CARD_VALUES]
+
+def _decode_images():
+    '''Decode every card image into memory, in the background loader'''
+    rects = atlas_rects()
+    atlas = PIL.Image.open(ATLAS_IMAGE).convert('RGBA') if rects else None
+    for name in texture_names():
+        rect = rects.get(name)
+        if rect is not None:
+            x, y, width, height = rect
+            _decoded[name] = atlas.crop((x, y, x + width, y + height))
+        else:
+            _decoded[name] = PIL.Image.open(resource_path(f"sprites/{name}.jpg")).convert('RGBA')
+
+def start_loading():
+    '''Start decoding the card images in the background, only the first time'''
+    global _loader
+    if _loader is None:
+        _loader = threading.Thread(target=_decode_images, name="card loader", daemon=True)
+        _loader.start()
+
+def upload_textures(ctx, count: int = UPLOAD_SLICE):
+    '''Send up to count decoded images to the GPU, return how many textures are ready'''
+    ready = 0
+    for name in texture_names():
+        if name not in _textures:
+            if count == 0 or name not in _decoded:
+                break
+            ctx.default_atlas.add(get_texture(name))
+            count -= 1
+        ready += 1
+    return ready
+
+def get_texture(name):
+    '''Return the shared texture for a card image, loading it the first time'''
+    global _texture_loads
+    texture = _textures.get(name)
+    if texture is None:
+        rect = atlas_rects().get(name)
+        image = _decoded.get(name)
+        if image is not None:
+            # Already decoded by the background loader
+            texture = arcade.Texture(f"cards/{name}", image, hit_box_algorithm='None')
+        elif rect is not None:
+            # arcade keeps the atlas image after the first read and only crops it
+            x, y, width, height = rect
+            texture = arcade.load_texture(ATLAS_IMAGE, x, y, width, height, hit_box_algorithm='None')
+        else:
+            # No atlas built, fall back to the single images
+            texture = arcade.load_texture(resource_path(f"sprites/{name}.jpg"), hit_box_algorithm='None')
+        _textures[name] = texture
+        _texture_loads += 1
+    return texture
+
+def preload_textures():
+    '''Load the cover and all the 52 faces so flipping never touches the disk'''
+    for name in texture_names():
+        get_texture(name)
+
+def texture_load_count():
+    '''Number of textures made since the last reset, read from disk or from a decoded image'''
+    return _texture_loads
+
+def reset_texture_loads():
+    '''Reset the texture load counter, done at the start of every game'''
+    global _texture_loads
+    _texture_loads = 0
 
 class Card(arcade.Sprite):
     '''Card class for Solitaire Game'''
-    
+
     def __init__(self, suit, value, scale: float = 1):
         '''Initialize the card'''
         self.suit = suit
         self.value = value
         self.colour = 'red' if suit in ['Hearts', 'Diamonds'] else 'black'
 
+        # The card as known by the game model
+        self.code = encode_card(suit, value)
+
         # Image to use for the sprite when face up
-        self.image_file_name = resource_path(f"sprites/{self.suit}/{self.value}.jpg")
+        self.image_name = card_name(self.suit, self.value)
         self.is_face_up = False
 
+        # Draw order on the table, the card with the highest depth is on top
+        self.depth = 0
+
+        # Textures for both sides, shared with every other card
+        self.face_texture = get_texture(self.image_name)
+        self.cover_texture = get_texture(COVER)
+
         # Call the parent class's init function
-        super().__init__(FACE_DOWN_IMAGE, scale, hit_box_algorithm='None')
+        super().__init__(texture=self.cover_texture, scale=scale, hit_box_algorithm='None')
 
     def face_down(self):
         '''Turn the card face down'''
-        self.texture = arcade.load_texture(FACE_DOWN_IMAGE)
+        self.texture = self.cover_texture
         self.is_face_up = False
 
     def face_up(self):
         '''Turn the card face up'''
-        self.texture = arcade.load_texture(self.image_file_name)
+        self.texture = self.face_texture
         self.is_face_up = True
 
     @property
     def is_face_down(self):
         '''Return True if the card is face down'''
-        return not self.is_face_up
\ No newline at end of file
+        return not self.is_face_up
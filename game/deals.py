@@ -0,0 +1,159 @@
+'''
+Seeded deals of the Solitaire Game and the catalogue of solved deals
+
+Deal number N is the deck shuffled with seed N, so a deal can be shared
+with its number. The catalogue is a binary file with the deck of the
+first deals already shuffled and tagged with the result of the solver.
+It is opened with mmap, so getting a deal from it is a slice of the file.
+
+Layout of the catalogue:
+    header  8 bytes  b"SOLD", version, 0, number of deals (uint16)
+    deals   52 bytes per deal, the card codes from the bottom of the deck
+            to the top. Card codes only use 6 bits, the 2 high bits of
+            the first byte hold the Normal Mode result and the 2 high
+            bits of the second byte the Hard Mode result.
+'''
+
+import argparse
+import mmap
+import os
+import random
+import struct
+from resources import resource_path
+from model import all_cards
+
+# Default catalogue, shipped with the game
+CATALOGUE_PATH = resource_path("deals/deals.bin")
+
+MAGIC = b"SOLD"
+VERSION = 1
+HEADER = struct.Struct("<4sBBH")
+DEAL_SIZE = 52
+
+# Results of the solver, as stored in the catalogue
+UNSOLVED = 0
+WINNABLE = 1
+NOT_WINNABLE = 2
+STATUS_CODES = {'unknown': UNSOLVED, 'win': WINNABLE, 'loss': NOT_WINNABLE}
+
+CARD_MASK = 0x3F
+STATUS_SHIFT = 6
+
+
+def deal_for_seed(seed):
+    '''Return the deck of a deal, the last card is the top of the deck'''
+    cards = all_cards()
+    generator = random.Random(seed)
+    # Fisher-Yates shuffle, every order of the deck is equally likely
+    for i in range(len(cards) - 1, 0, -1):
+        j = generator.randrange(i + 1)
+        cards[i], cards[j] = cards[j], cards[i]
+    return cards
+
+
+def random_deal_number():
+    '''Return the number of a random deal'''
+    return random.randrange(1 << 31)
+
+
+class DealCatalogue:
+    '''Catalogue of deals already shuffled and solved, read with mmap'''
+
+    def __init__(self, path: str = CATALOGUE_PATH):
+        '''Open the catalogue file'''
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a deal catalogue")
+
+    def __len__(self):
+        '''Number of deals in the catalogue'''
+        return self.count
+
+    def _offset(self, number):
+        '''Position of a deal in the file'''
+        if not 0 <= number < self.count:
+            raise IndexError(f"deal {number} is not in the catalogue")
+        return HEADER.size + number * DEAL_SIZE
+
+    def deal(self, number):
+        '''Return the deck of a deal'''
+        offset = self._offset(number)
+        return [byte & CARD_MASK for byte in self.data[offset:offset + DEAL_SIZE]]
+
+    def status(self, number, hard_mode: bool = False):
+        '''Return the solver result of a deal for a mode'''
+        return self.data[self._offset(number) + hard_mode] >> STATUS_SHIFT
+
+    def random_winnable(self, hard_mode: bool = False, tries: int = 100):
+        '''Return the number of a random deal the solver has won, or None'''
+        for _ in range(tries):
+            number = random.randrange(self.count)
+            if self.status(number, hard_mode) == WINNABLE:
+                return number
+        return None
+
+    def close(self):
+        '''Close the catalogue file'''
+        self.data.close()
+        self.file.close()
+
+
+# Catalogues already opened, by path
+_catalogues = {}
+
+
+def open_catalogue(path: str = CATALOGUE_PATH):
+    '''Open the catalogue once and share it, or return None if there is no catalogue'''
+    if path not in _catalogues:
+        _catalogues[path] = DealCatalogue(path) if os.path.exists(path) else None
+    return _catalogues[path]
+
+
+def get_deal(number, catalogue=None):
+    '''Return the deck of a deal, from the catalogue when it has it'''
+    if catalogue is not None and number < len(catalogue):
+        return catalogue.deal(number)
+    return deal_for_seed(number)
+
+
+def build_catalogue(path, count, workers, time_limit):
+    '''Shuffle and solve the first deals and write them to a catalogue'''
+    # Only needed to build the catalogue, not when the game starts
+    import multiprocessing
+    from batch_solver import solve_chunk
+
+    tasks = [(seed, seed + 1, [False, True], 200_000, time_limit) for seed in range(count)]
+    records = bytearray(count * DEAL_SIZE)
+    with multiprocessing.Pool(workers) as pool:
+        for rows in pool.imap_unordered(solve_chunk, tasks):
+            seed = rows[0]['seed']
+            record = bytearray(deal_for_seed(seed))
+            for row in rows:
+                record[row['mode'] == 'hard'] |= STATUS_CODES[row['status']] << STATUS_SHIFT
+            records[seed * DEAL_SIZE:(seed + 1) * DEAL_SIZE] = record
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as catalogue_file:
+        catalogue_file.write(HEADER.pack(MAGIC, VERSION, 0, count))
+        catalogue_file.write(records)
+
+
+def main():
+    '''Build the catalogue from the command line'''
+    parser = argparse.ArgumentParser(description="Build the catalogue of solved Solitaire deals")
+    parser.add_argument("--count", type=int, default=1000, help="number of deals, from deal 0")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--time-limit", type=float, default=5.0, help="solver time limit for each deal")
+    parser.add_argument("--output", default=os.path.join("deals", "deals.bin"))
+    args = parser.parse_args()
+
+    count = min(args.count, 0xFFFF)
+    build_catalogue(args.output, count, args.workers, args.time_limit)
+    print(f"Wrote {count} deals to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
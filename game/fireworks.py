@@ -1,30 +1,112 @@
+'''
+Fireworks of the winning screen
+
+All the particles live in NumPy arrays of a fixed size: a burst takes
+free slots of the pool, every update moves and fades all of them in one
+step and they are drawn as points in a single draw call, so nothing is
+allocated however long the winning screen stays up.
+'''
+
 import arcade
-import random
-
-class Firework(arcade.SpriteCircle):
-    def __init__(self, x, y):
-        super().__init__(radius=2, color=arcade.color.WHITE)
-        self.center_x = x
-        self.center_y = y
-        self.change_x = random.uniform(-3, 3)
-        self.change_y = random.uniform(-3, 3)
-        self.alpha = 255
-
-    def update(self):
-        self.center_x += self.change_x
-        self.center_y += self.change_y
-        # If alpha below 0 results in error
-        # Invalid value for alpha. Must be 0 to 255, received -1
-        self.alpha = max(0, self.alpha - 4)
-        if self.alpha < 0:
-            self.alpha = 0
-        self.color = (self.color[0], self.color[1], self.color[2], self.alpha)
-
-
-def create_firework(x, y):
-    particles = arcade.SpriteList()
-    for _ in range(100):
-        particle = Firework(x, y)
-        particles.append(particle)
-    return particles
+import numpy as np
+from arcade.gl import BufferDescription
+
+# Particles alive at most, a burst gets fewer when the pool is full
+CAPACITY = 4096
+
+# Particles of a burst, their speed (pixels per second) and how much
+# they fade every second (1 is fully visible)
+BURST_SIZE = 100
+MAX_SPEED = 180
+FADE_SPEED = 0.94
+
+# Size of a particle, in pixels
+PARTICLE_SIZE = 4
+
+VERTEX_SHADER = '''
+#version 330
+uniform Projection {
+    uniform mat4 matrix;
+} proj;
+uniform float size;
+
+in vec2 in_position;
+in float in_alpha;
+out float alpha;
+
+void main() {
+    gl_Position = proj.matrix * vec4(in_position, 0.0, 1.0);
+    gl_PointSize = size;
+    alpha = in_alpha;
+}
+'''
+
+FRAGMENT_SHADER = '''
+#version 330
+uniform vec3 color;
+in float alpha;
+out vec4 fragment_color;
+
+void main() {
+    // Dead particles and the corners of the point are not drawn
+    if (alpha <= 0.0 || length(gl_PointCoord - vec2(0.5)) > 0.5) {
+        discard;
+    }
+    fragment_color = vec4(color, alpha);
+}
+'''
+
+
+class Fireworks:
+    '''Pool of firework particles, updated and drawn all at once'''
+
+    def __init__(self, ctx, capacity: int = CAPACITY, color=arcade.color.WHITE):
+        '''Create the arrays and the buffer of the particles'''
+        self.ctx = ctx
+        self.capacity = capacity
+
+        # Position (x, y) and alpha of every particle, as sent to the GPU,
+        # a particle with an alpha of 0 is a free slot
+        self.particles = np.zeros((capacity, 3), dtype='f4')
+        self.velocity = np.zeros((capacity, 2), dtype='f4')
+        self.random = np.random.default_rng()
+
+        # Number of particles alive
+        self.alive = 0
+
+        self.buffer = ctx.buffer(reserve=self.particles.nbytes)
+        self.geometry = ctx.geometry([BufferDescription(self.buffer, '2f 1f', ['in_position', 'in_alpha'])],
+                                     mode=ctx.POINTS)
+        self.program = ctx.program(vertex_shader=VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER)
+        self.program['color'] = tuple(channel / 255 for channel in color[:3])
+        self.program['size'] = PARTICLE_SIZE
+
+    def burst(self, x, y, count: int = BURST_SIZE):
+        '''Start a firework at a position'''
+        free = np.flatnonzero(self.particles[:, 2] <= 0)[:count]
+        self.particles[free, 0] = x
+        self.particles[free, 1] = y
+        self.particles[free, 2] = 1
+        self.velocity[free] = self.random.uniform(-MAX_SPEED, MAX_SPEED, (len(free), 2))
+        self.alive += len(free)
+
+    def update(self, delta_time: float):
+        '''Move and fade all the particles'''
+        if self.alive == 0:
+            return
+        alpha = self.particles[:, 2]
+        self.particles[:, :2] += self.velocity * delta_time
+        alpha -= FADE_SPEED * delta_time
+        np.maximum(alpha, 0, out=alpha)
+        self.alive = np.count_nonzero(alpha)
 
+    def draw(self):
+        '''Draw all the particles alive'''
+        if self.alive == 0:
+            return
+        self.buffer.write(self.particles)
+        # The size of the points comes from the shader (the point_size
+        # setter of arcade 2.6 sets the size it had before)
+        self.ctx.enable(self.ctx.PROGRAM_POINT_SIZE)
+        self.geometry.render(self.program, vertices=self.capacity)
+        self.ctx.disable(self.ctx.PROGRAM_POINT_SIZE)
@@ -2,20 +2,28 @@
 Solitaire Game written in Python
 '''
 
+import argparse
+import threading
+import time
+
+# Taken before the other imports, for the startup report
+STARTED = time.perf_counter()
+
 import arcade
-import arcade.gui as gui
 import random
-import time
-from card import Card, resource_path
-from fireworks import Firework, create_firework
+from operator import attrgetter
+from card import Card, resource_path, preload_textures, reset_texture_loads, start_loading, upload_textures, \
+    texture_names, CARD_VALUES, CARD_SUITS
+from deals import open_catalogue, get_deal, random_deal_number
+from layers import open_layer
+from pacing import PacedWindow
+from hit_test import PileGrid
+from model import SolitaireGame, Move, DRAW, RECYCLE, FLIP, TRANSFER, encode_move, PILE_COUNT, \
+    BOTTOM_FACE_DOWN_PILE, PLAY_PILE_1, PLAY_PILE_7
 
 # Constants
 CARD_SCALE = 0.6
 
-# CARD CONSTANTS
-CARD_VALUES = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
-CARD_SUITS = ['Hearts', 'Diamonds', 'Clubs', 'Spades']
-
 # DIMENSIONS
 CARD_WIDTH = 140 * CARD_SCALE
 CARD_HEIGHT = 190 * CARD_SCALE
@@ -58,22 +66,18 @@ CARD_VERTICAL_OFFSET_UNTURNED = CARD_HEIGHT * CARD_SCALE * 0.3
 # Fan out cards stacked on each other from the bottom pile
 CARD_HORIZONTAL_OFFSET = CARD_WIDTH * CARD_SCALE
 
+# Seconds between two moves when playing back a replay
+REPLAY_MOVE_TIME = 0.3
+
+# Seconds between two cards going to the top piles when the game finishes itself
+AUTO_COMPLETE_MOVE_TIME = 0.05
+
+# Seconds a card takes to slide to its place after a move
+CARD_MOVE_TIME = 0.15
+
+# Seconds between two cards dealt, the last of the 28 lands after about a second
+DEAL_CARD_TIME = 0.03
 
-# Constants for the piles for the game
-PILE_COUNT = 13
-BOTTOM_FACE_DOWN_PILE = 0
-BOTTOM_FACE_UP_PILE = 1
-PLAY_PILE_1 = 2
-PLAY_PILE_2 = 3
-PLAY_PILE_3 = 4
-PLAY_PILE_4 = 5
-PLAY_PILE_5 = 6
-PLAY_PILE_6 = 7
-PLAY_PILE_7 = 8
-TOP_PILE_1 = 9
-TOP_PILE_2 = 10
-TOP_PILE_3 = 11
-TOP_PILE_4 = 12
 
 # Styles for the buttons
 unselected = {
@@ -96,6 +100,10 @@ selected = {
     "border_radius": 10,
 }
 
+def format_time(seconds):
+    '''Return the time as minutes:seconds'''
+    return f"{int(seconds // 60):02d}:{int(seconds % 60):02d}"
+
 # Screens background
 START_SCREEN = resource_path("sprites/screens/starting_screen.jpg")
 WINNING_SCREEN = resource_path("sprites/screens/starting_screen.jpg")
@@ -108,17 +116,53 @@ class StartView(arcade.View):
         super().__init__()
         self.hard = False
         self.background = arcade.load_texture(START_SCREEN)
-        self.ui_manager = gui.UIManager()
+
+        # The buttons are built when the screen is shown, arcade.gui is
+        # only imported then
+        self.ui_manager = None
         self.language = "EN"  # Default language
 
+        # Catalogue of solved deals, None if the game ships without it
+        self.catalogue = open_catalogue()
+
+        # Only deal games the solver has won
+        self.winnable_only = False
+
+        # Game left before it was finished, None if there is none or
+        # before it is read in the background
+        self.saved_game = None
+        self.saved_game_checked = False
+
+        # Key pressed to start a game or show the statistics before they
+        # were read in the background, it is handled once they are
+        self.waiting_key = None
+
+        # Deal number typed by the player, empty for a random deal
+        self.deal_number = ""
+
+        # Texts of the screen by language, and the deal options that
+        # are only laid out again when they change
+        self.texts = {}
+        self.deal_text = arcade.Text("", self.window.width / 2, self.window.height / 2 - 300,
+                                     arcade.color.LIGHT_GRAY, font_size=16, anchor_x="center")
+
+        # Card textures ready on the GPU, they are decoded in the
+        # background while this screen is up
+        self.cards_ready = 0
+        self.card_count = len(texture_names())
+        self.loading_text = arcade.Text("", self.window.width / 2, self.window.height / 2 - 340,
+                                        arcade.color.LIGHT_GRAY, font_size=12, anchor_x="center")
+
         self.selected = selected
         self.unselected = unselected
 
-        # Define the 2 buttons
-        self.en_button = gui.UIFlatButton()
-        self.ro_button = gui.UIFlatButton()
+        # The 2 buttons
+        self.en_button = None
+        self.ro_button = None
     
     def setup(self, en_style=selected, ro_style=unselected):
+        import arcade.gui as gui
+
         # Create a new UIManager instance
         self.ui_manager = gui.UIManager()
         self.ui_manager.enable()
@@ -154,12 +198,33 @@ class StartView(arcade.View):
         '''Called when view is activated'''
         self.setup()
         arcade.set_viewport(0, self.window.width, 0, self.window.height)
+        start_loading()
     
     def on_hide_view(self):
         self.ui_manager.disable()
 
     def on_update(self, delta_time):
         self.ui_manager.on_update(delta_time)
+
+        # Send a few of the decoded card images to the GPU every frame
+        if self.cards_ready < self.card_count:
+            self.cards_ready = upload_textures(self.window.ctx)
+            return
+
+        # Once the cards are ready the saved game and the statistics are read
+        # and the modules of the game imported in the background, then C
+        # shows up and a key pressed before is handled
+        start_preloading()
+        if not self.saved_game_checked and preloaded():
+            from save import open_autosaver
+            self.saved_game = open_autosaver().saved_game()
+            self.saved_game_checked = True
+            if self.saved_game is not None:
+                # Laid out again with the C key
+                self.texts = {}
+            if self.waiting_key is not None:
+                symbol, self.waiting_key = self.waiting_key, None
+                self.on_key_press(symbol, 0)
     
     def on_draw(self):
         '''Draw the view'''
@@ -169,63 +234,120 @@ class StartView(arcade.View):
         # Draw the background image
         arcade.draw_lrwh_rectangle_textured(0, 0, self.window.width, self.window.height, self.background)
 
-        # Draw the title
-        arcade.draw_text("Solitaire", self.window.width / 2, self.window.height / 2 + 100,
-                         arcade.color.WHITE, font_size=50, anchor_x="center")
+        # Draw the texts of the language and the mode selected
+        texts = self.texts_for(self.language)
+        for text in texts['instructions']:
+            text.draw()
+        for text in texts[self.hard]:
+            text.draw()
 
-        # Draw mode selection instructions
-        if self.language == "RO":
-            arcade.draw_text("Apasa N pentru a selecta Modul Normal", self.window.width / 2, self.window.height / 2 + 50,
-                             arcade.color.LIGHT_GRAY, font_size=20, anchor_x="center")
-            arcade.draw_text("Apasa H pentru a selecta Modul Greu", self.window.width / 2, self.window.height / 2,
-                             arcade.color.LIGHT_GRAY, font_size=20, anchor_x="center")
-            arcade.draw_text("Apasa Space pentru a incepe", self.window.width / 2, self.window.height / 2 - 50,
-                             arcade.color.LIGHT_GRAY, font_size=20, anchor_x="center")
-        elif self.language == "EN":
-            arcade.draw_text("Press N for Normal Mode", self.window.width / 2, self.window.height / 2 + 50,
-                            arcade.color.LIGHT_GRAY, font_size=20, anchor_x="center")
-            arcade.draw_text("Press H for Hard Mode", self.window.width / 2, self.window.height / 2,
-                            arcade.color.LIGHT_GRAY, font_size=20, anchor_x="center")
-            arcade.draw_text("Press Space to Start", self.window.width / 2, self.window.height / 2 - 50,
-                            arcade.color.LIGHT_GRAY, font_size=20, anchor_x="center")
-
-        # Show selected mode
-        if self.hard:
-            if self.language == "RO":
-                arcade.draw_text("Mod Greu Selectat", self.window.width / 2, self.window.height / 2 - 100,
-                             arcade.color.RED, font_size=20, anchor_x="center")
-                arcade.draw_text("Explicatie: In Modul Greu, vei avea 3 carti schimbate la apasarea pachetului de jos.", self.window.width / 2, self.window.height / 2 - 200,
-                             arcade.color.LIGHT_GRAY, font_size=14, anchor_x="center", multiline=True, width=self.window.width - 220)
-            elif self.language == "EN":
-                arcade.draw_text("Hard Mode Selected", self.window.width / 2, self.window.height / 2 - 100,
-                                arcade.color.RED, font_size=20, anchor_x="center")
-                arcade.draw_text("Explanation: In Hard Mode, you will have 3 cards swapped on click from the bottom pile.", self.window.width / 2, self.window.height / 2 - 200,
-                                arcade.color.LIGHT_GRAY, font_size=14, anchor_x="center", multiline=True, width=self.window.width - 220)
-        else:
-            if self.language == "RO":
-                arcade.draw_text("Mod Normal Selectat", self.window.width / 2, self.window.height / 2 - 100,
-                             arcade.color.GREEN, font_size=20, anchor_x="center")
-                arcade.draw_text("Explicatie: In Modul Normal, vei avea 1 carte schimbata la apasarea pachetului de jos.", self.window.width / 2, self.window.height / 2 - 200,
-                             arcade.color.LIGHT_GRAY, font_size=14, anchor_x="center", multiline=True, width=self.window.width - 220)
-            elif self.language == "EN":
-                arcade.draw_text("Normal Mode Selected", self.window.width / 2, self.window.height / 2 - 100,
-                                arcade.color.GREEN, font_size=20, anchor_x="center")
-                arcade.draw_text("Explanation: In Normal Mode, you will have 1 card swapped on click from the bottom pile.", self.window.width / 2, self.window.height / 2 - 200,
-                                arcade.color.LIGHT_GRAY, font_size=14, anchor_x="center", multiline=True, width=self.window.width - 220)
+        # Show the deal options
+        self.deal_text.text = self.deal_options()
+        self.deal_text.draw()
+
+        # Show how far the cards are loaded
+        if self.cards_ready < self.card_count:
+            label = "Se incarca cartile" if self.language == "RO" else "Loading the cards"
+            self.loading_text.text = f"{label}: {self.cards_ready}/{self.card_count}"
+            self.loading_text.draw()
 
         # Draw UI elements (buttons)
         self.ui_manager.draw()
 
+    def texts_for(self, language):
+        '''Return the texts of the start screen in a language, they are only laid out once'''
+        if language in self.texts:
+            return self.texts[language]
+
+        x = self.window.width / 2
+        y = self.window.height / 2
+        if language == "RO":
+            instructions = ["Apasa N pentru a selecta Modul Normal", "Apasa H pentru a selecta Modul Greu",
+                            "Apasa Space pentru a incepe"]
+            stats_hint = "S: statistici"
+            if self.saved_game is not None:
+                stats_hint += "    C: continua jocul salvat"
+            modes = {False: ("Mod Normal Selectat",
+                             "Explicatie: In Modul Normal, vei avea 1 carte schimbata la apasarea pachetului de jos."),
+                     True: ("Mod Greu Selectat",
+                            "Explicatie: In Modul Greu, vei avea 3 carti schimbate la apasarea pachetului de jos.")}
+        else:
+            instructions = ["Press N for Normal Mode", "Press H for Hard Mode", "Press Space to Start"]
+            stats_hint = "S: statistics"
+            if self.saved_game is not None:
+                stats_hint += "    C: continue the saved game"
+            modes = {False: ("Normal Mode Selected",
+                             "Explanation: In Normal Mode, you will have 1 card swapped on click from the bottom pile."),
+                     True: ("Hard Mode Selected",
+                            "Explanation: In Hard Mode, you will have 3 cards swapped on click from the bottom pile.")}
+
+        texts = {'instructions': [arcade.Text("Solitaire", x, y + 100, arcade.color.WHITE, font_size=50,
+                                              anchor_x="center")]}
+        for i, line in enumerate(instructions):
+            texts['instructions'].append(arcade.Text(line, x, y + 50 - 50 * i, arcade.color.LIGHT_GRAY,
+                                                     font_size=20, anchor_x="center"))
+        texts['instructions'].append(arcade.Text(stats_hint, x, y - 260, arcade.color.LIGHT_GRAY, font_size=14,
+                                                 anchor_x="center"))
+        for hard, (selected_text, explanation) in modes.items():
+            texts[hard] = [
+                arcade.Text(selected_text, x, y - 100, arcade.color.RED if hard else arcade.color.GREEN,
+                            font_size=20, anchor_x="center"),
+                arcade.Text(explanation, x, y - 200, arcade.color.LIGHT_GRAY, font_size=14, anchor_x="center",
+                            multiline=True, width=self.window.width - 220),
+            ]
+        self.texts[language] = texts
+        return texts
+
+    def deal_options(self):
+        '''Return the text of the deal options'''
+        if self.language == "RO":
+            deal_text = f"Scrie numarul jocului: {self.deal_number or 'aleator'}"
+            if self.catalogue is not None:
+                deal_text += f"    W: doar jocuri castigabile ({'DA' if self.winnable_only else 'NU'})"
+        else:
+            deal_text = f"Type a deal number: {self.deal_number or 'random'}"
+            if self.catalogue is not None:
+                deal_text += f"    W: winnable deals only ({'ON' if self.winnable_only else 'OFF'})"
+        return deal_text
+
     def on_key_press(self, symbol: int, modifiers: int):
         """ Handle key press events """
+        # The game and the statistics screen wait for the preloader
+        if symbol in (arcade.key.SPACE, arcade.key.S) and not self.saved_game_checked:
+            self.waiting_key = symbol
+            return
         if symbol == arcade.key.SPACE:
             game_view = SolitaireView()
-            game_view.setup(hard_mode=self.hard, language=self.language)
+            game_view.setup(hard_mode=self.hard, language=self.language, deal_number=self.choose_deal(),
+                            catalogue=self.catalogue)
             self.window.show_view(game_view)
         elif symbol == arcade.key.N:
             self.hard = False
         elif symbol == arcade.key.H:
             self.hard = True
+        elif symbol == arcade.key.C and self.saved_game is not None:
+            game_view = SolitaireView()
+            game_view.setup(hard_mode=self.saved_game[0].hard_mode, language=self.language,
+                            catalogue=self.catalogue, saved_game=self.saved_game)
+            self.window.show_view(game_view)
+        elif symbol == arcade.key.S:
+            self.window.show_view(StatsView(self.language))
+        elif symbol == arcade.key.W:
+            self.winnable_only = not self.winnable_only
+        elif arcade.key.KEY_0 <= symbol <= arcade.key.KEY_9 and len(self.deal_number) < 9:
+            self.deal_number += str(symbol - arcade.key.KEY_0)
+        elif symbol == arcade.key.BACKSPACE:
+            self.deal_number = self.deal_number[:-1]
+
+    def choose_deal(self):
+        '''Return the number of the deal to play'''
+        if self.deal_number:
+            return int(self.deal_number)
+        if self.winnable_only and self.catalogue is not None:
+            number = self.catalogue.random_winnable(self.hard)
+            if number is not None:
+                return number
+        return random_deal_number()
 
 class WinningView(arcade.View):
     '''Winning Screen'''
@@ -237,8 +359,36 @@ class WinningView(arcade.View):
         self.time_taken = time_taken
         self.moves = moves
         self.language = language
-        self.fireworks_list = []
+        # NumPy is only imported once a game is won
+        from fireworks import Fireworks
+        self.fireworks = Fireworks(self.window.ctx)
         self.next_firework_time = 0
+        self.texts = self.build_texts()
+
+    def build_texts(self):
+        '''Create the texts of the screen, none of them change'''
+        x = self.window.width / 2
+        y = self.window.height / 2
+        timer_text = format_time(self.time_taken)
+        white = arcade.color.WHITE
+        if self.language == "RO":
+            lines = [("Felicitari! Ai castigat!", x, y + 100, white, 40),
+                     ("Ai reusit sa termini jocul...", x, y, white, 40),
+                     ("Ai pierdut cu succes...", x, y - 50, white, 30),
+                     ("Timp: ", x, y - 100, white, 30),
+                     ("Miscari: ", x, y - 150, white, 30),
+                     ("Nota: Apasa R pentru a reveni la meniul de inceput", x, y - 350, arcade.color.LIGHT_GRAY, 20)]
+        else:
+            lines = [("You have finished the game...", x, y, white, 40),
+                     ("You have successfully wasted...", x, y - 50, white, 30),
+                     ("Time: ", x, y - 100, white, 30),
+                     ("Moves: ", x, y - 150, white, 30),
+                     ("Note: Press R to get to Start", x, y - 350, arcade.color.LIGHT_GRAY, 20)]
+        # Show the time taken and the number of moves to win the game
+        lines += [(timer_text, x + 140, y - 100, white, 30),
+                  (str(self.moves), x + 140, y - 150, white, 30)]
+        return [arcade.Text(text, text_x, text_y, color, font_size=size, anchor_x="center")
+                for text, text_x, text_y, color, size in lines]
 
     def on_show_view(self, language = "EN"):
         '''Called when view is activated'''
@@ -248,57 +398,16 @@ class WinningView(arcade.View):
 
     def on_draw(self, language = "EN"):
         '''Draw the view'''
-        language = self.language
         self.clear()
-        self.language = language
-        # Draw the timer inside a gray rectangle
-        minutes = int(self.time_taken // 60)
-        seconds = int(self.time_taken % 60)
-        timer_text = f"{minutes:02d}:{seconds:02d}"
 
         # Draw the background image
         arcade.draw_lrwh_rectangle_textured(0, 0, self.window.width, self.window.height, self.background)
 
-        if self.language == "RO":
-            arcade.draw_text("Felicitari! Ai castigat!", self.window.width / 2, self.window.height / 2 + 100,
-                         arcade.color.WHITE, font_size=40, anchor_x="center")
-            arcade.draw_text("Ai reusit sa termini jocul...", self.window.width / 2, self.window.height / 2,
-                         arcade.color.WHITE, font_size=40, anchor_x="center")
-            arcade.draw_text("Ai pierdut cu succes...", self.window.width / 2, self.window.height / 2 - 50,
-                        arcade.color.WHITE, font_size=30, anchor_x="center")
-            # Show the time taken to win the game
-            arcade.draw_text("Timp: ", self.window.width / 2, self.window.height / 2 - 100,
-                         arcade.color.WHITE, font_size=30, anchor_x="center")
-            arcade.draw_text(timer_text, self.window.width / 2 + 140, self.window.height / 2 - 100,
-                         arcade.color.WHITE, font_size=30, anchor_x="center")
-            # Show the number of moves to win the game
-            arcade.draw_text("Miscari: ", self.window.width / 2, self.window.height / 2 - 150,
-                         arcade.color.WHITE, font_size=30, anchor_x="center")
-            arcade.draw_text(str(self.moves), self.window.width / 2 + 140, self.window.height / 2 - 150,
-                         arcade.color.WHITE, font_size=30, anchor_x="center")
-            arcade.draw_text("Nota: Apasa R pentru a reveni la meniul de inceput", self.window.width / 2, self.window.height / 2 - 350,
-                        arcade.color.LIGHT_GRAY, font_size=20, anchor_x="center")
-        elif self.language == "EN":
-            arcade.draw_text("You have finished the game...", self.window.width / 2, self.window.height / 2,
-                            arcade.color.WHITE, font_size=40, anchor_x="center")
-            arcade.draw_text("You have successfully wasted...", self.window.width / 2, self.window.height / 2 - 50,
-                            arcade.color.WHITE, font_size=30, anchor_x="center")
-            # Show the time taken to win the game
-            arcade.draw_text("Time: ", self.window.width / 2, self.window.height / 2 - 100,
-                            arcade.color.WHITE, font_size=30, anchor_x="center")
-            arcade.draw_text(timer_text, self.window.width / 2 + 140, self.window.height / 2 - 100,
-                            arcade.color.WHITE, font_size=30, anchor_x="center")
-            # Show the number of moves to win the game
-            arcade.draw_text("Moves: ", self.window.width / 2, self.window.height / 2 - 150,
-                            arcade.color.WHITE, font_size=30, anchor_x="center")
-            arcade.draw_text(str(self.moves), self.window.width / 2 + 140, self.window.height / 2 - 150,
-                            arcade.color.WHITE, font_size=30, anchor_x="center")
-            arcade.draw_text("Note: Press R to get to Start", self.window.width / 2, self.window.height / 2 - 350,
-                            arcade.color.LIGHT_GRAY, font_size=20, anchor_x="center")
+        for text in self.texts:
+            text.draw()
 
         # Draw fireworks
-        for fireworks in self.fireworks_list:
-            fireworks.draw()
+        self.fireworks.draw()
 
     def on_update(self, delta_time):
         '''Update the view'''
@@ -307,11 +416,9 @@ class WinningView(arcade.View):
             self.next_firework_time = current_time + random.uniform(0.5, 1.5)
             firework_x = random.randint(100, self.window.width - 100)
             firework_y = random.randint(200, self.window.height - 100)
-            self.fireworks_list.append(create_firework(firework_x, firework_y))
+            self.fireworks.burst(firework_x, firework_y)
 
-        for fireworks in self.fireworks_list:
-            fireworks.update()
-        self.fireworks_list = [fireworks for fireworks in self.fireworks_list if len(fireworks) > 0]
+        self.fireworks.update(delta_time)
 
     def on_key_press(self, symbol: int, modifiers: int):
         """ If the user presses the mouse button, start the game. """
@@ -319,6 +426,74 @@ class WinningView(arcade.View):
             game_view = StartView()
             self.window.show_view(game_view)
 
+class StatsView(arcade.View):
+    '''Statistics Screen'''
+
+    def __init__(self, language: str = "EN"):
+        '''Initialize the view, the totals are kept up to date as games finish'''
+        super().__init__()
+        self.background = arcade.load_texture(START_SCREEN)
+        self.language = language
+        from stats import open_stats
+        self.texts = self.build_texts(open_stats().totals)
+
+    def build_texts(self, totals):
+        '''Create the texts of the screen from the totals of every mode'''
+        if self.language == "RO":
+            title = "Statistici"
+            modes = ["Normal", "Greu"]
+            labels = ["Jocuri jucate", "Jocuri castigate", "Procent castig", "Cel mai bun timp",
+                      "Cele mai putine miscari", "Seria curenta", "Cea mai buna serie"]
+            note = "Nota: Apasa R pentru a reveni la meniul de inceput"
+        else:
+            title = "Statistics"
+            modes = ["Normal", "Hard"]
+            labels = ["Games played", "Games won", "Win rate", "Best time", "Fewest moves", "Current streak",
+                      "Best streak"]
+            note = "Note: Press R to get to Start"
+
+        x = self.window.width / 2
+        y = self.window.height / 2
+        white = arcade.color.WHITE
+        texts = [arcade.Text(title, x, y + 250, white, font_size=40, anchor_x="center"),
+                 arcade.Text(note, x, y - 350, arcade.color.LIGHT_GRAY, font_size=20, anchor_x="center")]
+        for i, label in enumerate(labels):
+            texts.append(arcade.Text(label, x - 400, y + 100 - 50 * i, white, font_size=20))
+        for column, (mode, mode_name) in enumerate(zip(("normal", "hard"), modes)):
+            mode_totals = totals[mode]
+            games = mode_totals['games']
+            wins = mode_totals['wins']
+            best_time = mode_totals['best_time']
+            best_moves = mode_totals['best_moves']
+            values = [str(games), str(wins), f"{wins / games:.0%}" if games else "-",
+                      format_time(best_time) if best_time is not None else "-",
+                      str(best_moves) if best_moves is not None else "-",
+                      str(mode_totals['streak']), str(mode_totals['best_streak'])]
+            column_x = x + 100 + 200 * column
+            texts.append(arcade.Text(mode_name, column_x, y + 170, arcade.color.LIGHT_GREEN, font_size=24,
+                                     anchor_x="center"))
+            for i, value in enumerate(values):
+                texts.append(arcade.Text(value, column_x, y + 100 - 50 * i, white, font_size=20,
+                                         anchor_x="center"))
+        return texts
+
+    def on_show_view(self):
+        '''Called when view is activated'''
+        arcade.set_viewport(0, self.window.width, 0, self.window.height)
+
+    def on_draw(self):
+        '''Draw the view'''
+        self.clear()
+        arcade.draw_lrwh_rectangle_textured(0, 0, self.window.width, self.window.height, self.background)
+        for text in self.texts:
+            text.draw()
+
+    def on_key_press(self, symbol: int, modifiers: int):
+        '''Go back to the start screen'''
+        if symbol in (arcade.key.R, arcade.key.S, arcade.key.ESCAPE):
+            start_view = StartView()
+            self.window.show_view(start_view)
+
 class SolitaireView(arcade.View):
     '''Main Solitaire Game class'''
 
@@ -333,7 +508,8 @@ class SolitaireView(arcade.View):
 
         arcade.set_background_color(arcade.color.AMAZON) # Set background color to Card Table Green (Amazon)
 
-        # List of cards that we will drag with the mouse
+        # List of cards that we will drag with the mouse, they stay in
+        # card_list but are left out of the table while they are held
         self.held_cards = None
 
         # Original location of cards we are dragging
@@ -346,27 +522,80 @@ class SolitaireView(arcade.View):
         # Timer to check how long the game has been running
         self.elapsed_time = 0
 
-        # Create a list of lists, each holds a pile of cards
-        self.piles = None
+        # Rules and piles of the game, without the sprites
+        self.game = None
+
+        # Sprite of every card of the model
+        self.card_sprites = None
+
+        # Where the piles and their cards are, for layout and clicks
+        self.grid = None
+
+        # Depth of the next card pulled to the top, card_list is sorted by
+        # depth once before it is drawn instead of after every card
+        self.next_depth = 0
+        self.order_changed = False
+
+        # Finds the best move when the player asks for a hint
+        self.hints = None
+
+        # Records the moves of the game to a replay file
+        self.recorder = None
+
+        # Moves of the replay being played back, None when playing
+        self.replay_codes = None
+        self.replay_timer = 0
+
+        # Mats, cards on the table and HUD, drawn again only when they change
+        self.board_layer = None
+
+        # Timer, moves and deal number, drawn from text laid out once
+        self.hud_boxes = None
+        self.hud_texts = None
+        self.timer_text = None
+        self.moves_text = None
+
+        # Moves of the auto-complete still to be shown, the last one first
+        self.auto_moves = []
+        self.auto_timer = 0
 
         # Create a variable for winning state
         self.won = False
 
+        # The game was counted in the statistics, won or left
+        self.stats_saved = False
+
         # Timer to check how long the game has been running
         self.start_time = time.time()
 
-        # Number of points the user has
-        self.moves = 0
+        # Number of the deal being played
+        self.deal_number = 0
 
         # Last click time for double-click detection
         self.last_click_time = 0
 
     
-    def setup(self, hard_mode: bool, language="EN"):
-        '''Set up the game and also restart the game'''
-
-        # Sprite list with all the cards
-        self.held_cards = []
+    def setup(self, hard_mode: bool, language="EN", deal_number=None, catalogue=None, replay_codes=None,
+              saved_game=None):
+        '''Set up the game and also restart the game, play back a replay or continue a saved game'''
+        self.stats_saved = False
+
+        # A saved game is continued as it was left, else a new game gives it up
+        if saved_game is not None:
+            saved, deal_number, _, seconds = saved_game
+            hard_mode = saved.hard_mode
+            self.elapsed_time = seconds
+            self.start_time = time.time() - seconds
+        elif replay_codes is None:
+            self.give_up_saved_game()
+
+        # The same number always gives the same deal
+        if deal_number is None:
+            deal_number = random_deal_number()
+        self.deal_number = deal_number
+
+        # Sprite list with the cards held by the mouse
+        self.held_cards = arcade.SpriteList()
 
         # Set the language
         self.language = language
@@ -406,128 +635,288 @@ class SolitaireView(arcade.View):
 
         # --- Create, shuffle, and deal the cards
 
+        # Count the texture loads of this game, the faces are decoded
+        # behind the start screen (or read from disk here if the player
+        # was quicker) and then shared by every card
+        reset_texture_loads()
+        preload_textures()
+
         # Sprite list with all the cards
         self.card_list = arcade.SpriteList()
 
         # Create the cards
+        self.card_sprites = {}
         for suit in CARD_SUITS:
             for value in CARD_VALUES:
                 card = Card(suit, value, CARD_SCALE)
                 card.position = START_X, BOTTOM_Y
                 self.card_list.append(card)
+                self.card_sprites[card.code] = card
+
+        # Picture of the table, only the held cards, the sliding cards and
+        # the timer move every frame. The window keeps it from one game to
+        # the next, a new game only draws it again
+        self.board_layer = open_layer(self.window, arcade.color.AMAZON)
+
+        # Cards sliding to their place, left out of the table and drawn over
+        # it until they get there
+        from tweens import CardTweens
+        self.moving_cards = arcade.SpriteList()
+        self.tweens = CardTweens()
+
+        # --- Deal out the cards, or put them back where they were
+        if saved_game is not None:
+            self.game = saved
+        else:
+            self.game = SolitaireGame(hard_mode)
+            self.game.deal(get_deal(deal_number, catalogue))
+        from hint import HintEngine
+        self.hints = HintEngine(self.game)
+        self.grid = PileGrid(self.game, [mat.position for mat in self.pile_mat_list], (MAT_WIDTH, MAT_HEIGHT),
+                             (CARD_WIDTH, CARD_HEIGHT), CARD_VERTICAL_OFFSET, CARD_VERTICAL_OFFSET_UNTURNED,
+                             CARD_HORIZONTAL_OFFSET)
+
+        # Play back the replay, or record the game
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        self.replay_codes = None
+        self.auto_moves = []
+        if replay_codes is not None:
+            self.replay_codes = list(reversed(replay_codes))
+            self.replay_timer = 0
+        else:
+            from replay import new_recorder, UNDO
+            self.recorder = new_recorder(deal_number, hard_mode)
+            # The replay of a saved game starts with the moves made before,
+            # and the moves undone are made and undone again so Y redoes them
+            for code in self.game.history:
+                self.recorder.record(code)
+            for code in reversed(self.game.redo_log):
+                self.recorder.record(code)
+            for _ in self.game.redo_log:
+                self.recorder.record(UNDO)
+
+        # A saved game is put back at once, a new one is dealt card by card
+        if saved_game is not None:
+            for pile_index in range(PILE_COUNT):
+                self.layout_pile(pile_index, slide=False)
+        else:
+            self.deal_cards()
 
-        # Shuffle the cards
-        for pos1 in range(len(self.card_list)):
-            pos2 = random.randrange(len(self.card_list))
-            self.card_list.swap(pos1, pos2)
-
-        # Create a list of lists, each holds a pile of cards.
-        self.piles = [[] for _ in range(PILE_COUNT)]
-
-        # Put all the cards in the bottom face down pile
-        for card in self.card_list:
-            self.piles[BOTTOM_FACE_DOWN_PILE].append(card)
-
-        # --- Deal out the cards
-
-        # Loop for each pile
-        for pile_no in range(PLAY_PILE_1, PLAY_PILE_7 + 1):
-            # Deal the right number of cards
-            for i in range(pile_no - PLAY_PILE_1 + 1):
-                # Pop the card off the deck we are dealing from
-                card = self.piles[BOTTOM_FACE_DOWN_PILE].pop()
-                # Add the card to the pile we are dealing to
-                self.piles[pile_no].append(card)
-                # Move card to the same position as the pile
-                if not card.is_face_up:
-                    card.position = (self.pile_mat_list[pile_no].center_x, 
-                                     self.pile_mat_list[pile_no].center_y - CARD_VERTICAL_OFFSET_UNTURNED * i)
-                else:
-                    card.position = self.pile_mat_list[pile_no].position
-                # Put on top in draw order
-                self.pull_to_top(card)
+        self.build_hud()
+
+        # The game was left while it was finishing itself
+        if self.game.can_auto_complete():
+            self.start_auto_complete()
+
+    def build_hud(self):
+        '''Create the text of the timer and the moves, it is only laid out again when it changes'''
+        # Gray rectangles behind the timer and the moves
+        rect_x = SCREEN_WIDTH - 100
+        rect_y = SCREEN_HEIGHT - 40
+        points_rect_y = SCREEN_HEIGHT - 80
+        self.hud_boxes = arcade.ShapeElementList()
+        self.hud_boxes.append(arcade.create_rectangle_filled(rect_x, rect_y, 80, 30, arcade.color.LIGHT_GRAY))
+        self.hud_boxes.append(arcade.create_rectangle_filled(rect_x, points_rect_y, 80, 30, arcade.color.LIGHT_GRAY))
 
-            # Flip up the top cards
-            self.piles[pile_no][-1].face_up()
-            self.piles[pile_no][-1].position = self.pile_mat_list[pile_no].center_x, self.pile_mat_list[pile_no].center_y - CARD_VERTICAL_OFFSET_UNTURNED * (len(self.piles[pile_no]) - 1)
+        if self.language == "RO":
+            time_label, moves_label, deal_label = "Timp", "Miscari", "Joc"
+        else:
+            time_label, moves_label, deal_label = "Time", "Moves", "Deal"
+
+        self.timer_text = arcade.Text(format_time(self.elapsed_time), rect_x, rect_y,
+                                      arcade.color.BLACK, 20, anchor_x="center", anchor_y="center")
+        self.moves_text = arcade.Text(str(self.game.moves), rect_x, points_rect_y,
+                                      arcade.color.BLACK, 20, anchor_x="center", anchor_y="center")
+        self.hud_texts = [
+            arcade.Text(time_label, rect_x - 90, rect_y, arcade.color.BLACK, 20, anchor_x="center", anchor_y="center"),
+            arcade.Text(moves_label, rect_x - 90, points_rect_y, arcade.color.BLACK, 20,
+                        anchor_x="center", anchor_y="center"),
+            self.moves_text,
+            # The deal number, so the same deal can be played again
+            arcade.Text(f"{deal_label} #{self.deal_number}", rect_x + 40, points_rect_y - 40,
+                        arcade.color.WHITE, 14, anchor_x="right", anchor_y="center"),
+        ]
 
 
     def on_draw(self):
         '''Render the screen'''
+        # Nothing changed since the last frame, it stays on screen
+        if self.window.keep_last_frame():
+            return
+
         # Clear the screen
         self.clear()
 
+        # Draw the table, it is only drawn again after a move
+        self.board_layer.draw(self.draw_board)
+
+        # Draw the cards sliding to their place, held by the mouse and the timer
+        if self.moving_cards:
+            self.moving_cards.sort(key=attrgetter('depth'))
+            self.moving_cards.draw()
+        self.held_cards.draw()
+        self.timer_text.draw()
+
+        # Show the hint, if the player asked for one
+        if self.hints.hint is not None:
+            self.draw_hint(self.hints.hint)
+
+
+    def draw_board(self):
+        '''Draw everything that only changes with a move'''
         # Draw the mats the cards go on to
         self.pile_mat_list.draw()
-        
-        # Draw the sprites
-        self.card_list.draw()
 
-        # Draw the timer inside a gray rectangle
-        minutes = int(self.elapsed_time // 60)
-        seconds = int(self.elapsed_time % 60)
-        timer_text = f"{minutes:02d}:{seconds:02d}"
-        
-        # Define the rectangle dimensions
-        rect_x = SCREEN_WIDTH - 100
-        rect_y = SCREEN_HEIGHT - 40
-        rect_width = 80
-        rect_height = 30
-        
-        # Draw the gray rectangle
-        arcade.draw_rectangle_filled(rect_x, rect_y, rect_width, rect_height, arcade.color.LIGHT_GRAY)
-        
-        # Draw the Time text
-        if self.language == "RO":
-            arcade.draw_text("Timp", rect_x-90, rect_y,
-                         arcade.color.BLACK, 20, anchor_x="center", anchor_y="center")
-        elif self.language == "EN":
-            arcade.draw_text("Time", rect_x-90, rect_y,
-                            arcade.color.BLACK, 20, anchor_x="center", anchor_y="center")
-
-        # Draw the timer text
-        arcade.draw_text(timer_text, rect_x, rect_y,
-                         arcade.color.BLACK, 20, anchor_x="center", anchor_y="center")
-        
-        # Define the points rectangle dimensions
-        points_rect_x = SCREEN_WIDTH - 100
-        points_rect_y = SCREEN_HEIGHT - 80
-        points_rect_width = 80
-        points_rect_height = 30
-        
-        # Draw the gray rectangle
-        arcade.draw_rectangle_filled(points_rect_x, points_rect_y, points_rect_width, points_rect_height, arcade.color.LIGHT_GRAY)
+        # Draw the sprites, the held and sliding cards are hidden there for
+        # a moment instead of being taken out of card_list and put back
+        self.sort_cards()
+        self.set_visible(False)
+        self.card_list.draw()
+        self.set_visible(True)
 
-        # Draw the moves text
-        if self.language == "RO":
-            arcade.draw_text("Miscari", points_rect_x-90, points_rect_y,
-                         arcade.color.BLACK, 20, anchor_x="center", anchor_y="center")
-        elif self.language == "EN":
-            arcade.draw_text("Moves", points_rect_x-90, points_rect_y,
-                            arcade.color.BLACK, 20, anchor_x="center", anchor_y="center")
-        
-        # Draw the moves inside the rectangle
-        arcade.draw_text(str(self.moves), points_rect_x, points_rect_y,
-                         arcade.color.BLACK, 20, anchor_x="center", anchor_y="center")
+        # Draw the moves and the labels, the text only changes with them
+        self.hud_boxes.draw()
+        for text in self.hud_texts:
+            text.draw()
 
     def on_update(self, delta_time: float):
         '''Update the game'''
 
-        # Update the timer
+        # Update the timer, its text only once a second, and only then
+        # the frame is drawn again
         self.elapsed_time = time.time() - self.start_time
+        timer = format_time(self.elapsed_time)
+        if timer != self.timer_text.text:
+            self.timer_text.text = timer
+            self.window.invalidate()
+
+        # Let the hint search think for a small part of the frame
+        hint = self.hints.hint
+        self.hints.update()
+        if self.hints.hint is not hint:
+            self.window.invalidate()
+
+        # Play the next move of the replay
+        if self.replay_codes:
+            self.replay_timer += delta_time
+            if self.replay_timer >= REPLAY_MOVE_TIME:
+                from replay import step
+                self.replay_timer = 0
+                self.show_move(step(self.game, self.replay_codes.pop()))
+                self.check_winning()
+
+        # Send the next card of the auto-complete to its top pile
+        if self.auto_moves:
+            self.auto_timer += delta_time
+            while self.auto_moves and self.auto_timer >= AUTO_COMPLETE_MOVE_TIME:
+                self.auto_timer -= AUTO_COMPLETE_MOVE_TIME
+                code, pile_index = self.auto_moves.pop()
+                card = self.card_sprites[code]
+                self.pull_to_top(card)
+                self.slide(card, self.pile_mat_list[pile_index].position)
+
+        # Slide all the moving cards at once, they go back on the table
+        # together so it is only drawn again once
+        if self.tweens.active:
+            self.tweens.update(delta_time)
+            if not self.tweens.active:
+                self.put_down()
+                self.check_winning()
+
+        # Draw every frame while something moves or the hint search thinks,
+        # else the window slows down after a while
+        if self.tweens.active or self.auto_moves or self.replay_codes or self.hints.thinking:
+            self.window.wake()
+        elif self.board_layer.dirty:
+            self.window.invalidate()
+
+    def on_hide_view(self):
+        '''Called when the game is left, finish writing the replay'''
+        if self.recorder is not None:
+            self.recorder.close()
+        self.autosave()
+
+    def on_close(self):
+        '''Called when the window is closed during the game'''
+        self.autosave()
+
+    def autosave(self):
+        '''Save the game in progress, it is written in the background'''
+        if self.game is None or self.replay_codes is not None or self.game.is_won():
+            return
+        if not self.game.history and not self.game.redo_log:
+            return
+        from save import open_autosaver, pack_game
+        open_autosaver().save(pack_game(self.game, self.deal_number, self.language, self.elapsed_time))
+
+    def give_up_saved_game(self):
+        '''Count the saved game as lost, a new game is started instead'''
+        from save import open_autosaver
+        from stats import open_stats
+        autosaver = open_autosaver()
+        saved_game = autosaver.saved_game()
+        if saved_game is None:
+            return
+        game, deal_number, language, seconds = saved_game
+        open_stats().record(deal_number, game.hard_mode, language, False, seconds, game.moves)
+        autosaver.discard()
+
+    def save_stats(self, won: bool):
+        '''Count the game in the statistics, once and only if a move was made'''
+        if self.stats_saved or self.game is None or self.replay_codes is not None or not self.game.history:
+            return
+        self.stats_saved = True
+        from stats import open_stats
+        open_stats().record(self.deal_number, self.hard_mode, self.language, won, self.elapsed_time,
+                            self.game.moves)
+
+    def draw_hint(self, move):
+        '''Draw a frame around the cards of the hint and where they go'''
+        if move.kind in (DRAW, RECYCLE):
+            targets = [self.pile_mat_list[BOTTOM_FACE_DOWN_PILE]]
+        elif move.kind == FLIP:
+            targets = [self.card_sprites[self.game.top_card(move.source)]]
+        else:
+            top_card = self.game.top_card(move.target)
+            targets = [self.card_sprites[self.game.piles[move.source][-move.count]],
+                       self.pile_mat_list[move.target] if top_card is None else self.card_sprites[top_card]]
+        for target in targets:
+            arcade.draw_rectangle_outline(target.center_x, target.center_y, CARD_WIDTH + 6, CARD_HEIGHT + 6,
+                                          arcade.color.YELLOW, 3)
 
     def pull_to_top(self, card: arcade.Sprite):
         '''Pull card to top of rendering order'''
+        card.depth = self.next_depth
+        self.next_depth += 1
+        self.order_changed = True
 
-        # Remove card from list
-        self.card_list.remove(card)
+    def set_visible(self, visible: bool):
+        '''Show or hide the cards held by the mouse and the cards sliding'''
+        for card in self.held_cards:
+            card.visible = visible
+        for card in self.moving_cards:
+            card.visible = visible
 
-        # Add card to end of list
-        self.card_list.append(card)
+    def sort_cards(self):
+        '''Put card_list in draw order, in one pass for all the cards pulled to the top'''
+        if self.order_changed:
+            self.card_list.sort(key=attrgetter('depth'))
+            self.order_changed = False
 
     def on_mouse_press(self, x, y, button, key_modifiers):
         '''Handle mouse click events'''
 
+        # The player can only watch a replay or the auto-complete
+        if self.replay_codes is not None or self.auto_moves:
+            return
+        self.window.wake()
+
+        # Cards still sliding are put in their place, the click is on the game as it is
+        self.tweens.finish()
+        self.put_down()
+
         if button != arcade.MOUSE_BUTTON_LEFT:
             # Reset position of the cards
             # If not, multiple cards can be selected
@@ -540,258 +929,191 @@ class SolitaireView(arcade.View):
         double_click = curr_time - self.last_click_time < 0.3
         self.last_click_time = curr_time
 
-        # Get list of cards that were clicked
-        cards = arcade.get_sprites_at_point((x, y), self.card_list)
+        # Get the card that was clicked from the grid, only when the
+        # cards of two piles overlap there ask the sprites
+        top_card = None
+        hits = self.grid.cards_at(x, y)
+        if len(hits) == 1:
+            pile_index, position = hits[0]
+            top_card = self.card_sprites[self.game.piles[pile_index][position]]
+        elif hits:
+            self.sort_cards()
+            top_card = arcade.get_sprites_at_point((x, y), self.card_list)[-1]
 
         # If we clicked on a card, grab it
-        if len(cards) > 0:
-
-            # Get the top card (might be a stack of cards)
-            top_card = cards[-1]
+        if top_card is not None:
 
             # Figure out which pile the card is in
-            pile_index = self.get_pile_for_card(top_card)
+            pile_index = self.game.get_pile_for_card(top_card.code)
 
             # If we double-clicked, try to move the card to a top pile
             if double_click and top_card.is_face_up:
-                for top_pile_index in range(TOP_PILE_1, TOP_PILE_4 + 1):
-                    # If the card is the top card of the pile
-                    if self.can_add_to_top_pile(top_card, top_pile_index):
-                        self.move_card_to_new_pile(top_card, top_pile_index)
-                        top_card.position = self.pile_mat_list[top_pile_index].position
-                        top_card.is_face_up = True
-                        self.pull_to_top(top_card)  # Adjust z-order
-                        self.moves += 1
-                        # --- Win check
-                        self.check_winning()
-                        return
+                top_pile_index = self.game.top_pile_for(top_card.code)
+                if top_pile_index is not None:
+                    self.apply_move(Move(TRANSFER, pile_index, top_pile_index, 1))
+                    # --- Win check
+                    self.check_winning()
+                    return
             elif pile_index == BOTTOM_FACE_DOWN_PILE:
-                if self.hard_mode:
-                    # Move all face up cards to the position of the face up mat pile
-                    for card in self.piles[BOTTOM_FACE_UP_PILE]:
-                        card.position = self.pile_mat_list[BOTTOM_FACE_UP_PILE].position
-                    # Flip 3 cards
-                    for i in range(3):
-                        # If we run out of cards, stop
-                        if len(self.piles[BOTTOM_FACE_DOWN_PILE]) == 0:
-                            break
-                        # Get the top card
-                        card = self.piles[BOTTOM_FACE_DOWN_PILE][-1]
-                        # Flip face up
-                        card.face_up()
-                        # Move card position to bottom-right face up pile
-                        card.position = self.pile_mat_list[BOTTOM_FACE_UP_PILE].position
-                        card.center_x += CARD_HORIZONTAL_OFFSET * i
-                        # Remove card from face down pile
-                        self.piles[BOTTOM_FACE_DOWN_PILE].remove(card)
-                        # Add card to face up pile
-                        self.piles[BOTTOM_FACE_UP_PILE].append(card)
-                        # Put on top in draw order
-                        self.pull_to_top(card)
-                        self.moves += 1
-                else:
-                    # Flip 1 card
-                    # Get the top card
-                    card = self.piles[BOTTOM_FACE_DOWN_PILE][-1]
-                    # Flip face up
-                    card.face_up()
-                    # Move card position to bottom-right face up pile
-                    card.position = self.pile_mat_list[BOTTOM_FACE_UP_PILE].position
-                    # Remove card from face down pile
-                    self.piles[BOTTOM_FACE_DOWN_PILE].remove(card)
-                    # Add card to face up pile
-                    self.piles[BOTTOM_FACE_UP_PILE].append(card)
-                    # Put on top in draw order
-                    self.pull_to_top(card)
-                    self.moves += 1
+                # Flip 1 card, or 3 cards in hard mode
+                self.apply_move(self.game.draw_move())
             elif top_card.is_face_down:
                 # Check if the card is the top card of the pile
-                if self.piles[pile_index][-1] == top_card:
+                if self.game.top_card(pile_index) == top_card.code:
                     # Flip the card
-                    top_card.face_up()
+                    self.apply_move(Move(FLIP, pile_index, pile_index, 1))
             else:
-                # In case of hardmode, select only
-                # the top card of the face up card pile
-                # if not, return
-                if self.get_pile_for_card(top_card) == BOTTOM_FACE_UP_PILE: 
-                    if top_card != self.piles[BOTTOM_FACE_UP_PILE][-1]:
-                        return
-                # All other cases, grab the face-up card we are clicking on
-                self.held_cards = [top_card]
-                self.held_cards_original_position = [self.held_cards[0].position]
-                self.pull_to_top(self.held_cards[0])
-
-                # Check if there is a stack of cards, and grab those too
-                index = self.piles[pile_index].index(top_card)
-                for i in range(index + 1, len(self.piles[pile_index])):
-                    card = self.piles[pile_index][i]
+                # Only the top card of the face up pile and of the top piles
+                # can be taken, from a middle pile the stack above comes too
+                count = self.game.can_pick_up(top_card.code)
+                if count == 0:
+                    return
+                for card in self.game.get_stack(top_card.code):
+                    card = self.card_sprites[card]
                     self.held_cards.append(card)
                     self.held_cards_original_position.append(card.position)
-                    self.pull_to_top(card)
+                self.board_layer.invalidate()
         else:
             # If clicked on mat instead of a card
-            mats = arcade.get_sprites_at_point((x, y), self.pile_mat_list)
-
-            if len(mats) > 0:
-                mat = mats[0]
-                mat_index = self.pile_mat_list.index(mat)
+            mat_index = self.grid.pile_at(x, y)
 
+            if mat_index is not None:
                 # If there are no cards on the mat
-                if mat_index == BOTTOM_FACE_DOWN_PILE and len(self.piles[BOTTOM_FACE_DOWN_PILE]) == 0:
+                if mat_index == BOTTOM_FACE_DOWN_PILE and len(self.game.piles[BOTTOM_FACE_DOWN_PILE]) == 0:
                     # Flip the deck back over so we can restart
-                    temp_list = self.piles[BOTTOM_FACE_UP_PILE].copy()
-                    self.moves += 1
-                    for card in reversed(temp_list):
-                        card.face_down()
-                        self.piles[BOTTOM_FACE_UP_PILE].remove(card)
-                        self.piles[BOTTOM_FACE_DOWN_PILE].append(card)
-                        card.position = self.pile_mat_list[BOTTOM_FACE_DOWN_PILE].position
-
-    def can_add_to_top_pile(self, card, pile_index):
-        '''Check if a card can be added to a top pile'''
-        if len(self.piles[pile_index]) == 0:
-            return card.value == 'A'
-        top_card = self.piles[pile_index][-1]
-        return top_card.suit == card.suit and CARD_VALUES.index(top_card.value) + 1 == CARD_VALUES.index(card.value)
-
-    def remove_card_from_pile(self, card):
-        '''Remove the card from the pile'''
-        for pile in self.piles:
-            if card in pile:
-                pile.remove(card)
-                break
-
-    def get_pile_for_card(self, card):
-        '''Get the pile for the card'''
-        for index, pile in enumerate(self.piles):
-            if card in pile:
-                return index
-
-        return None
-
-    def move_card_to_new_pile(self, card, new_pile):
-        '''Move the card to a new pile'''
-        self.remove_card_from_pile(card)
-        self.piles[new_pile].append(card)
+                    move = self.game.draw_move()
+                    if move is not None:
+                        self.apply_move(move)
+
+    def apply_move(self, move):
+        '''Make the move in the game and move the sprites with it'''
+        self.game.apply(move)
+        if self.recorder is not None:
+            self.recorder.record(encode_move(move))
+        self.show_move(move)
+
+        # Finish the game by itself once nothing is left to decide
+        if self.game.can_auto_complete():
+            self.start_auto_complete()
+
+    def start_auto_complete(self):
+        '''Make all the moves to the top piles at once, the cards follow one by one'''
+        heights = [len(pile) for pile in self.game.piles]
+        moves = self.game.auto_complete()
+
+        # Card moved by every move, found from the top piles once they are full
+        cards = []
+        for move in moves:
+            cards.append((self.game.piles[move.target][heights[move.target]], move.target))
+            heights[move.target] += 1
+            if self.recorder is not None:
+                self.recorder.record(encode_move(move))
+        self.auto_moves = cards[::-1]
+        self.auto_timer = 0
+        self.hints.moves_made(moves)
+        self.moves_text.text = str(self.game.moves)
+
+    def show_move(self, move, record=None):
+        '''Move the sprites of the piles changed by a move, made or undone'''
+        if move is None:
+            return
+        if record is not None and self.recorder is not None:
+            self.recorder.record(record)
+        self.layout_pile(move.source)
+        if move.target != move.source:
+            self.layout_pile(move.target)
+        self.hints.move_made(move)
+        self.moves_text.text = str(self.game.moves)
+        self.autosave()
+
+    def layout_pile(self, pile_index, slide=True):
+        '''Send the sprites of a pile where the cards of the model are'''
+        pile = self.game.piles[pile_index]
+
+        # Cards are fanned out in the play piles, and in hard mode the
+        # last 3 cards of the face up pile
+        for code, position in zip(pile, self.grid.card_positions(pile_index)):
+            card = self.card_sprites[code]
+            self.turn_card(card)
+            # Put on top in draw order
+            self.pull_to_top(card)
+            if slide:
+                self.slide(card, position)
+            else:
+                card.position = position
+        self.board_layer.invalidate()
+
+    def deal_cards(self):
+        '''Deal the play piles from the deck one card after the other, row by row like by hand'''
+        self.layout_pile(BOTTOM_FACE_DOWN_PILE, slide=False)
+        positions = [self.grid.card_positions(pile_index) for pile_index in range(PILE_COUNT)]
+        delay = 0.0
+        for row in range(PLAY_PILE_7 - PLAY_PILE_1 + 1):
+            for pile_index in range(PLAY_PILE_1 + row, PLAY_PILE_7 + 1):
+                card = self.card_sprites[self.game.piles[pile_index][row]]
+                self.turn_card(card)
+                self.pull_to_top(card)
+                self.slide(card, positions[pile_index][row], delay)
+                delay += DEAL_CARD_TIME
+
+    def turn_card(self, card):
+        '''Show the face or the back of a card, as in the model'''
+        if self.game.is_face_up(card.code) and card.is_face_down:
+            card.face_up()
+        elif not self.game.is_face_up(card.code) and card.is_face_up:
+            card.face_down()
+
+    def slide(self, card, position, delay=0.0):
+        '''Move a card to a position, it slides there over the next frames'''
+        if card not in self.moving_cards:
+            if card.position == position and delay == 0:
+                return
+            # Drawn over the table until all the cards got to their place
+            self.moving_cards.append(card)
+            self.board_layer.invalidate()
+        self.tweens.add(card, position, CARD_MOVE_TIME, delay)
+
+    def put_down(self):
+        '''Put the cards that stopped sliding back on the table'''
+        if not self.moving_cards:
+            return
+        # Taken out one by one, clearing the list would make its buffers again
+        while self.moving_cards:
+            self.moving_cards.pop()
+        self.board_layer.invalidate()
 
     def on_mouse_release(self, x, y, button, key_modifiers):
         '''Handle mouse release events'''
-        
+
         # If we are holding cards, see if they are over a mat
         if len(self.held_cards) == 0:
             return
+        self.window.wake()
 
-        # Find the closest mat that the card is over 
-        # (in case there are more)
-        pile, distance = arcade.get_closest_sprite(self.held_cards[0], self.pile_mat_list)
+        source = self.game.get_pile_for_card(self.held_cards[0].code)
+        count = len(self.held_cards)
         reset_position = True
 
-        # Check if we are in contact with the closest mat or the cards in it
-        if arcade.check_for_collision(self.held_cards[0], pile):
-
-            # Get the index of the pile we are over
-            pile_index = self.pile_mat_list.index(pile)
-
-            # If we are over the same pile
-            if pile_index == self.get_pile_for_card(self.held_cards[0]):
-                # Reset position of cards
-                reset_position = True
-
-            # If we are on a middle play pile
-            elif pile_index >= PLAY_PILE_1 and pile_index <= PLAY_PILE_7:
-                # Check if there are no cards in the pile
-                if len(self.piles[pile_index]) > 0:
-                    # Check if the top card is one value higher and a different color
-                    top_card = self.piles[pile_index][-1]
-                    if top_card.colour != self.held_cards[0].colour and \
-                        CARD_VALUES.index(top_card.value) - 1 == CARD_VALUES.index(self.held_cards[0].value) and top_card.suit != self.held_cards[0].suit:
-                        # Move cards to proper position
-                        for i, dropped_card in enumerate(self.held_cards):
-                            dropped_card.position = top_card.center_x, \
-                                                    top_card.center_y - CARD_VERTICAL_OFFSET * (i + 1)
-                        reset_position = False
-                        self.moves += 1
-                    else:
-                        # Reset position of cards
-                        reset_position = True
-                else:
-                    # If there are no cards in the pile
-                    # Move cards only if there is a 'K' card
-                    if self.held_cards[0].value == 'K':
-                        # Move cards to proper position
-                        for i, dropped_card in enumerate(self.held_cards):
-                            if i == 0:
-                                dropped_card.position = pile.position
-                                first_card = dropped_card
-                            else:
-                                dropped_card.position = first_card.center_x, \
-                                                    first_card.center_y - CARD_VERTICAL_OFFSET * i
-                        reset_position = False
-                        self.moves += 1
-                    else:
-                        # Reset position of cards
-                        reset_position = True
-                if not reset_position:
-                    for card in self.held_cards:
-                        # Cards are in the right position, but we need to move them to the right list
-                        self.move_card_to_new_pile(card, pile_index)
-            # If we are on a top play pile
-            elif pile_index >= TOP_PILE_1 and pile_index <= TOP_PILE_4 and len(self.held_cards) == 1:
-                # If the pile is empty, only allow an Ace to be dropped
-                if len(self.piles[pile_index]) == 0 and self.held_cards[0].value == 'A':
-                    # Move card to card list
-                    self.move_card_to_new_pile(self.held_cards[0], pile_index)
-                    # Move card to pile
-                    self.held_cards[0].position = pile.position
-                    reset_position = False
-                    self.moves += 1
-                # If the pile is not empty, only allow cards of the same suit and one higher value
-                elif len(self.piles[pile_index]) > 0:
-                    top_card = self.piles[pile_index][-1]
-                    if top_card.suit == self.held_cards[0].suit and \
-                        CARD_VALUES.index(top_card.value) + 1 == CARD_VALUES.index(self.held_cards[0].value):
-                        # Move card to card list
-                        self.move_card_to_new_pile(self.held_cards[0], pile_index)
-                        # Move card to pile
-                        self.held_cards[0].position = pile.position
-                        reset_position = False
-                        self.moves += 1
-                else:
-                    # Reset position of cards
-                    reset_position = True
-        else:
-            # Check if we are over a card pile
-            for pile_index in range(PILE_COUNT):
-                if len(self.piles[pile_index]) > 0:
-                    top_card = self.piles[pile_index][-1]
-                    if arcade.check_for_collision(self.held_cards[0], top_card):
-                        if pile_index >= PLAY_PILE_1 and pile_index <= PLAY_PILE_7:
-                            if top_card.colour != self.held_cards[0].colour and \
-                                    CARD_VALUES.index(top_card.value) - 1 == CARD_VALUES.index(self.held_cards[0].value):
-                                # Move cards to proper position
-                                for i, dropped_card in enumerate(self.held_cards):
-                                    dropped_card.position = top_card.center_x, \
-                                                            top_card.center_y - CARD_VERTICAL_OFFSET * (i + 1)
-                                reset_position = False
-                                self.moves += 1
-                                for card in self.held_cards:
-                                    self.move_card_to_new_pile(card, pile_index)
-                                break
-                        elif pile_index >= TOP_PILE_1 and pile_index <= TOP_PILE_4 and len(self.held_cards) == 1:
-                            if top_card.suit == self.held_cards[0].suit and \
-                                    CARD_VALUES.index(top_card.value) + 1 == CARD_VALUES.index(self.held_cards[0].value):
-                                self.move_card_to_new_pile(self.held_cards[0], pile_index)
-                                self.held_cards[0].position = top_card.position
-                                reset_position = False
-                                self.moves += 1
-                                break
+        # The cards go back on the table, on top of the others
+        for card in self.held_cards:
+            self.pull_to_top(card)
+        self.board_layer.invalidate()
+
+        for pile_index in self.grid.drop_piles(*self.held_cards[0].position):
+            if self.game.can_transfer(source, pile_index, count):
+                # Cards go to the new pile, and in the right position
+                self.apply_move(Move(TRANSFER, source, pile_index, count))
+                reset_position = False
+                break
+
         if reset_position:
-            # Reset position of the cards
+            # The cards slide back where they were
             for i, card in enumerate(self.held_cards):
-                card.position = self.held_cards_original_position[i]
+                self.slide(card, self.held_cards_original_position[i])
 
         # We are no longer holding cards
-        self.held_cards = []
+        self.held_cards.clear()
+        self.held_cards_original_position = []
 
         # --- Win check
         self.check_winning()
@@ -800,35 +1122,123 @@ class SolitaireView(arcade.View):
         """ User moves mouse """
 
         # If we are holding cards, move them with the mouse
+        if not self.held_cards:
+            return
+        self.window.wake()
         for card in self.held_cards:
             card.center_x += dx
             card.center_y += dy
 
     def on_key_press(self, symbol: int, modifiers: int):
         '''Handle key press events'''
+        from replay import UNDO, REDO
+        self.window.wake()
         if symbol == arcade.key.R:
             # Restart the game
             game_view = StartView()
             self.window.show_view(game_view)
-            # self.start_time = time.time()
-            # self.moves = 0
-            # self.setup(self.hard_mode)
+        elif symbol == arcade.key.H:
+            # Look for the best move, it shows up when found
+            self.hints.request()
+        elif symbol == arcade.key.Z and not self.held_cards and self.replay_codes is None and not self.auto_moves:
+            # Undo the last move
+            self.show_move(self.game.undo(), UNDO)
+        elif symbol == arcade.key.Y and not self.held_cards and self.replay_codes is None and not self.auto_moves:
+            # Redo the last move undone
+            self.show_move(self.game.redo(), REDO)
 
     def check_winning(self):
         '''Check if the player has won the game'''
-        for pile in self.piles[TOP_PILE_1:]:
-            if len(pile) != 13:
-                return
+        # Wait for the cards of the auto-complete to slide to the top piles
+        if not self.game.is_won() or self.auto_moves or self.tweens.active:
+            return
+        self.save_stats(won=True)
+        # Watching a replay leaves the player's saved game alone
+        if self.replay_codes is None:
+            from save import open_autosaver
+            open_autosaver().discard()
         # Show the winning window
-        view = WinningView(self.elapsed_time, self.moves, language=self.language)
+        view = WinningView(self.elapsed_time, self.game.moves, language=self.language)
         self.window.show_view(view)
 
+# Thread reading the saved game and the statistics and importing the modules of the game, started once
+_preloader = None
+
+
+def start_preloading():
+    '''Read the saved game and the statistics and import the game modules in the background, only the first time'''
+    global _preloader
+    if _preloader is None:
+        _preloader = threading.Thread(target=_preload, name="preloader", daemon=True)
+        _preloader.start()
+
+
+def preloaded():
+    '''Return True once the saved game and the statistics are read and the modules imported'''
+    return _preloader is not None and not _preloader.is_alive()
+
+
+def _preload():
+    '''Read the saved game and the statistics, then import what the game screen needs (NumPy takes a while)'''
+    from save import open_autosaver
+    from stats import open_stats
+    open_autosaver().saved_game()
+    open_stats()
+    import hint, replay, tweens  # noqa: F401
+
+
+def report_startup(window, phases):
+    '''Print how long the game took to show its first frame, once it is on screen'''
+    flip = window.flip
+
+    def first_flip():
+        flip()
+        # Every frame after this one goes straight to the window
+        del window.flip
+        window.ctx.finish()
+        phases.append(("first frame", time.perf_counter()))
+        steps = ", ".join(f"{name} {(end - start) * 1000:.0f} ms"
+                          for (_, start), (name, end) in zip(phases, phases[1:]))
+        print(f"Startup: first frame after {(phases[-1][1] - STARTED) * 1000:.0f} ms ({steps})", flush=True)
+
+    window.flip = first_flip
+
+
 def main():
     '''Main function to run the game'''
-    window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, TITLE)
-    start_view = StartView()
-    window.show_view(start_view)
+    parser = argparse.ArgumentParser(description=TITLE)
+    parser.add_argument("--replay", help="play back a recorded game")
+    parser.add_argument("--profile", action="store_true",
+                        help="measure the handlers of the views (F3 shows them, F4 records a trace)")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print how long the game took to show its first frame")
+    args = parser.parse_args()
+    phases = [("start", STARTED), ("imports", time.perf_counter())]
+
+    # Frames are only drawn when something changed, every frame when profiling
+    window = PacedWindow(SCREEN_WIDTH, SCREEN_HEIGHT, TITLE, paced=not args.profile)
+    phases.append(("window", time.perf_counter()))
+    if args.startup_report:
+        report_startup(window, phases)
+    if args.profile:
+        from profiler import Profiler
+        Profiler().install(window)
+    if args.replay:
+        from replay import read_replay
+        deal_number, hard_mode, codes = read_replay(args.replay)
+        game_view = SolitaireView()
+        game_view.setup(hard_mode, deal_number=deal_number, catalogue=open_catalogue(), replay_codes=codes)
+        window.show_view(game_view)
+    else:
+        start_view = StartView()
+        window.show_view(start_view)
+    phases.append(("first view", time.perf_counter()))
     arcade.run()
+    # Finish writing the statistics and the save of the last game
+    from stats import close_stats
+    from save import close_autosaver
+    close_stats()
+    close_autosaver()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,128 @@
+'''
+Hints for the Solitaire Game
+
+The HintEngine keeps the legal moves between every two piles up to date
+as moves are made: after a move only the moves from and to the two piles
+that changed are looked at again. The best move comes from a short solver
+search on a copy of the game, run a few nodes at a time from on_update so
+the game keeps drawing at full frame rate while it thinks. The answer is
+kept for every position, by the hash of the game.
+'''
+
+import time
+from model import Move, FLIP, PILE_COUNT, BOTTOM_FACE_UP_PILE, PLAY_PILE_1, PLAY_PILE_7, is_top_pile
+from solver import search, ordered_moves, WIN
+
+# Nodes searched for a hint, and how often the search stops to check the time
+HINT_NODES = 3000
+NODES_PER_STEP = 8
+
+# Seconds of every frame given to the search
+FRAME_BUDGET = 0.004
+
+# Positions remembered before the cache starts again
+CACHE_SIZE = 512
+
+
+class HintEngine:
+    '''Finds the best move of a game, without stalling a frame'''
+
+    def __init__(self, game):
+        '''Initialize the engine for a game that was just dealt'''
+        self.game = game
+
+        # Legal moves from every pile to every other pile
+        self.pair_moves = [[[] for _ in range(PILE_COUNT)] for _ in range(PILE_COUNT)]
+        self.refresh(range(PILE_COUNT))
+
+        # Best move of every position already looked at, by hash of the game
+        self.cache = {}
+
+        # Move to show, None when there is no hint
+        self.hint = None
+
+        # Search running for the current position, and the move to show
+        # if it does not find a win
+        self.search = None
+        self.search_hash = None
+        self.fallback = None
+
+    def refresh(self, piles):
+        '''Look again at the moves from and to the piles that changed'''
+        changed = set(piles)
+        for source in range(BOTTOM_FACE_UP_PILE, PILE_COUNT):
+            for target in range(PLAY_PILE_1, PILE_COUNT):
+                if source != target and (source in changed or target in changed):
+                    self.pair_moves[source][target] = self.game.moves_between(source, target)
+
+    def move_made(self, move):
+        '''Update the moves after a move was made (or undone) in the game'''
+        self.refresh((move.source, move.target))
+        self.hint = None
+        self.search = None
+
+    def moves_made(self, moves):
+        '''Update the moves after several moves were made at once'''
+        piles = set()
+        for move in moves:
+            piles.update((move.source, move.target))
+        self.refresh(piles)
+        self.hint = None
+        self.search = None
+
+    def candidates(self):
+        '''Return all the legal moves of the game'''
+        moves = []
+        draw = self.game.draw_move()
+        if draw is not None:
+            moves.append(draw)
+
+        for pile_index in range(PLAY_PILE_1, PLAY_PILE_7 + 1):
+            top_card = self.game.top_card(pile_index)
+            if top_card is not None and not self.game.is_face_up(top_card):
+                moves.append(Move(FLIP, pile_index, pile_index, 1))
+
+        for source in range(BOTTOM_FACE_UP_PILE, PILE_COUNT):
+            for target in range(PLAY_PILE_1, PILE_COUNT):
+                moves.extend(self.pair_moves[source][target])
+        return moves
+
+    def request(self):
+        '''Start looking for the best move of the current position'''
+        key = self.game.hash
+        if key in self.cache:
+            self.hint = self.cache[key]
+            return
+
+        moves = ordered_moves(self.game, self.candidates())
+        # Moving a card back from a top pile is never worth a hint
+        moves = [move for move in moves if not is_top_pile(move.source)]
+        if not moves:
+            self.hint = None
+            return
+        self.fallback = moves[0]
+        self.search_hash = key
+        self.search = search(self.game.copy(), max_nodes=HINT_NODES, time_limit=None,
+                             table_bits=16, yield_every=NODES_PER_STEP)
+
+    @property
+    def thinking(self):
+        '''Return True while the search is running'''
+        return self.search is not None
+
+    def update(self, budget: float = FRAME_BUDGET):
+        '''Run the search for at most `budget` seconds, called every frame'''
+        if self.search is None:
+            return
+        end = time.perf_counter() + budget
+        try:
+            while time.perf_counter() < end:
+                next(self.search)
+        except StopIteration as stop:
+            result = stop.value
+            best = result.moves[0] if result.status == WIN and result.moves else self.fallback
+            if len(self.cache) >= CACHE_SIZE:
+                self.cache.clear()
+            self.cache[self.search_hash] = best
+            self.hint = best
+            self.search = None
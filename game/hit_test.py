@@ -0,0 +1,178 @@
+'''
+Hit-testing of the Solitaire Game table
+
+The piles sit on a fixed grid: a column every X_SPACING pixels and three
+rows of mats. Where every card lies follows from its pile and its
+position in the pile, so the pile and the card under a point are worked
+out with a few subtractions and divisions instead of testing every sprite.
+Only when the cards of two piles overlap (a long play pile reaching the
+bottom row) is the answer left to the sprites, which know the draw order.
+'''
+
+import math
+from model import BOTTOM_FACE_UP_PILE, is_play_pile
+
+
+class PileGrid:
+    '''Positions of the piles and of their cards on the table'''
+
+    def __init__(self, game, mat_positions, mat_size, card_size, fan_down, fan_down_unturned, fan_right):
+        '''Initialize the grid from the center of the mat of every pile'''
+        self.game = game
+        self.mat_positions = list(mat_positions)
+        self.mat_half_width = mat_size[0] / 2
+        self.mat_half_height = mat_size[1] / 2
+        self.card_half_width = card_size[0] / 2
+        self.card_half_height = card_size[1] / 2
+
+        # Offsets between cards fanned out, down in the play piles and to
+        # the right for the last 3 cards of the face up pile in hard mode
+        self.fan_down = fan_down
+        self.fan_down_unturned = fan_down_unturned
+        self.fan_right = fan_right
+
+        # Piles of every column of the grid
+        self.first_x = min(x for x, _ in self.mat_positions)
+        xs = sorted(set(x for x, _ in self.mat_positions))
+        self.spacing = xs[1] - xs[0]
+        self.columns = {}
+        for pile_index, (x, _) in enumerate(self.mat_positions):
+            self.columns.setdefault(self.column_of(x), []).append(pile_index)
+
+    def column_of(self, x):
+        '''Return the column nearest to an x position'''
+        return round((x - self.first_x) / self.spacing)
+
+    def _fan_start(self, pile_index, size):
+        '''Return the position after which the cards of a pile are fanned to the right'''
+        if self.game.hard_mode and pile_index == BOTTOM_FACE_UP_PILE:
+            return size - 3
+        return size
+
+    def _face_down_count(self, pile):
+        '''Return the number of face down cards at the bottom of a play pile'''
+        count = 0
+        face_up = self.game.face_up
+        while count < len(pile) and not face_up[pile[count]]:
+            count += 1
+        return count
+
+    def card_positions(self, pile_index):
+        '''Return the center of every card of a pile, from the bottom card'''
+        pile = self.game.piles[pile_index]
+        x, y = self.mat_positions[pile_index]
+        if is_play_pile(pile_index):
+            face_down = self._face_down_count(pile)
+            return [(x, y - self.fan_down_unturned * min(i, face_down) - self.fan_down * max(i - face_down, 0))
+                    for i in range(len(pile))]
+        fan_start = self._fan_start(pile_index, len(pile))
+        return [(x + self.fan_right * (i - fan_start), y) if i > fan_start else (x, y)
+                for i in range(len(pile))]
+
+    def card_position(self, pile_index, position):
+        '''Return the center of one card of a pile'''
+        pile = self.game.piles[pile_index]
+        x, y = self.mat_positions[pile_index]
+        if is_play_pile(pile_index):
+            face_down = self._face_down_count(pile)
+            return x, y - self.fan_down_unturned * min(position, face_down) - \
+                self.fan_down * max(position - face_down, 0)
+        fan_start = self._fan_start(pile_index, len(pile))
+        return (x + self.fan_right * (position - fan_start), y) if position > fan_start else (x, y)
+
+    def _card_in_pile(self, pile_index, x, y):
+        '''Return the position of the top card of a pile under a point, or None'''
+        pile = self.game.piles[pile_index]
+        if not pile:
+            return None
+        mat_x, mat_y = self.mat_positions[pile_index]
+
+        if is_play_pile(pile_index):
+            if abs(x - mat_x) > self.card_half_width:
+                return None
+            # The lowest card whose top edge is above the point is the top
+            # one there, if its bottom edge is under the point
+            reach = mat_y - y + self.card_half_height
+            if reach < 0:
+                return None
+            face_down = self._face_down_count(pile)
+            if reach >= self.fan_down_unturned * face_down:
+                position = face_down + math.floor((reach - self.fan_down_unturned * face_down) / self.fan_down)
+            else:
+                position = math.floor(reach / self.fan_down_unturned)
+            position = min(position, len(pile) - 1)
+            _, card_y = self.card_position(pile_index, position)
+            return position if y >= card_y - self.card_half_height else None
+
+        # Only the last 3 cards of the face up pile are apart, the top one first
+        for position in range(len(pile) - 1, max(len(pile) - 4, -1), -1):
+            card_x, card_y = self.card_position(pile_index, position)
+            if abs(x - card_x) <= self.card_half_width and abs(y - card_y) <= self.card_half_height:
+                return position
+        return None
+
+    def cards_at(self, x, y):
+        '''Return the (pile, position) of the top card of every pile under a point
+
+        More than one means the piles overlap there and the draw order
+        decides which card is on top.
+        '''
+        candidates = list(self.columns.get(self.column_of(x), ()))
+        # The face up pile is fanned into the next columns in hard mode
+        if BOTTOM_FACE_UP_PILE not in candidates:
+            candidates.append(BOTTOM_FACE_UP_PILE)
+        hits = []
+        for pile_index in candidates:
+            position = self._card_in_pile(pile_index, x, y)
+            if position is not None:
+                hits.append((pile_index, position))
+        return hits
+
+    def pile_at(self, x, y):
+        '''Return the pile whose mat is under a point, or None'''
+        for pile_index in self.columns.get(self.column_of(x), ()):
+            mat_x, mat_y = self.mat_positions[pile_index]
+            if abs(x - mat_x) <= self.mat_half_width and abs(y - mat_y) <= self.mat_half_height:
+                return pile_index
+        return None
+
+    def drop_piles(self, x, y):
+        '''Return the piles a card centered on a point is dropped on, best match first
+
+        The mat nearest to the card if the card touches it, else every
+        pile whose top card the card touches.
+        '''
+        reach = self.card_half_width + self.mat_half_width
+        candidates = []
+        for column in range(self.column_of(x - reach), self.column_of(x + reach) + 1):
+            candidates.extend(self.columns.get(column, ()))
+
+        best = None
+        best_distance = None
+        for pile_index in candidates:
+            mat_x, mat_y = self.mat_positions[pile_index]
+            if abs(x - mat_x) <= self.card_half_width + self.mat_half_width and \
+                    abs(y - mat_y) <= self.card_half_height + self.mat_half_height:
+                distance = math.hypot(x - mat_x, y - mat_y)
+                if best is None or distance < best_distance:
+                    best, best_distance = pile_index, distance
+        if best is not None:
+            return [best]
+
+        reach = 2 * self.card_half_width
+        candidates = []
+        for column in range(self.column_of(x - reach), self.column_of(x + reach) + 1):
+            candidates.extend(self.columns.get(column, ()))
+        # The face up pile is fanned into the next columns in hard mode
+        if BOTTOM_FACE_UP_PILE not in candidates:
+            candidates.append(BOTTOM_FACE_UP_PILE)
+
+        piles = []
+        for pile_index in sorted(candidates):
+            size = len(self.game.piles[pile_index])
+            if size == 0:
+                continue
+            card_x, card_y = self.card_position(pile_index, size - 1)
+            if abs(x - card_x) <= 2 * self.card_half_width and abs(y - card_y) <= 2 * self.card_half_height:
+                piles.append(pile_index)
+        return piles
@@ -0,0 +1,87 @@
+'''
+Offscreen layers of the Solitaire Game
+
+Most frames of the game only move the cards held by the mouse, the mats,
+the cards lying on the table and the HUD stay the same until a move is
+made. A CachedLayer draws them once to a texture, and every frame after
+that is a single textured quad until the layer is invalidated.
+'''
+
+import arcade
+from arcade.gl import geometry
+
+VERTEX_SHADER = '''
+#version 330
+in vec2 in_vert;
+in vec2 in_uv;
+out vec2 uv;
+
+void main() {
+    gl_Position = vec4(in_vert, 0.0, 1.0);
+    uv = in_uv;
+}
+'''
+
+FRAGMENT_SHADER = '''
+#version 330
+uniform sampler2D layer;
+in vec2 uv;
+out vec4 fragment_color;
+
+void main() {
+    fragment_color = texture(layer, uv);
+}
+'''
+
+
+class CachedLayer:
+    '''Picture of the parts of the screen that only change now and then'''
+
+    def __init__(self, window: arcade.Window, background_color):
+        '''Create the texture the layer is drawn to, as big as the window'''
+        self.ctx = window.ctx
+        self.background_color = background_color
+        self.texture = self.ctx.texture(window.get_framebuffer_size(), components=4)
+        self.framebuffer = self.ctx.framebuffer(color_attachments=[self.texture])
+        self.quad = geometry.quad_2d_fs()
+        self.program = self.ctx.program(vertex_shader=VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER)
+
+        # The layer has to be drawn again before it is shown
+        self.dirty = True
+
+        # Number of times the layer was drawn again
+        self.renders = 0
+
+    def invalidate(self):
+        '''Draw the layer again the next time it is shown'''
+        self.dirty = True
+
+    def draw(self, draw_layer):
+        '''Show the layer, drawing it first with draw_layer() if it changed'''
+        if self.dirty:
+            with self.framebuffer.activate():
+                self.framebuffer.clear(self.background_color)
+                draw_layer()
+            self.dirty = False
+            self.renders += 1
+
+        # The layer covers the whole window, nothing to blend with
+        self.ctx.disable(self.ctx.BLEND)
+        self.texture.use(0)
+        self.quad.render(self.program)
+        self.ctx.enable(self.ctx.BLEND)
+
+
+# Layer of every window, it is made once and drawn again for every game
+_layers = {}
+
+
+def open_layer(window: arcade.Window, background_color):
+    '''Return the layer of a window, it is only created the first time and invalidated after'''
+    layer = _layers.get(window)
+    if layer is None:
+        layer = _layers[window] = CachedLayer(window, background_color)
+    else:
+        layer.background_color = background_color
+        layer.invalidate()
+    return layer
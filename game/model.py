@@ -0,0 +1,503 @@
+'''
+Rules of the Solitaire Game, without anything from arcade
+
+The model only knows about piles of cards, which cards are face up and
+the number of moves. SolitaireView turns the clicks into moves for the
+model and places the sprites from the piles of the model.
+'''
+
+import random
+from array import array
+from collections import namedtuple
+from operator import attrgetter
+
+# CARD CONSTANTS
+CARD_VALUES = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
+CARD_SUITS = ['Hearts', 'Diamonds', 'Clubs', 'Spades']
+
+# Constants for the piles for the game
+PILE_COUNT = 13
+BOTTOM_FACE_DOWN_PILE = 0
+BOTTOM_FACE_UP_PILE = 1
+PLAY_PILE_1 = 2
+PLAY_PILE_2 = 3
+PLAY_PILE_3 = 4
+PLAY_PILE_4 = 5
+PLAY_PILE_5 = 6
+PLAY_PILE_6 = 7
+PLAY_PILE_7 = 8
+TOP_PILE_1 = 9
+TOP_PILE_2 = 10
+TOP_PILE_3 = 11
+TOP_PILE_4 = 12
+
+# Kinds of moves
+DRAW = 0        # Turn cards from the face down pile to the face up pile
+RECYCLE = 1     # Put the face up pile back on the empty face down pile
+FLIP = 2        # Turn the face down top card of a play pile
+TRANSFER = 3    # Move cards from one pile to another
+
+# A move of the game, `count` is the number of cards moved
+Move = namedtuple('Move', ['kind', 'source', 'target', 'count'])
+
+# In the undo and redo logs a move takes 2 bytes: the kind in the top
+# 2 bits, then the source and target piles in 4 bits each and the number
+# of cards in the last 6 bits
+KIND_SHIFT = 14
+SOURCE_SHIFT = 10
+TARGET_SHIFT = 6
+PILE_MASK = 0x0F
+COUNT_MASK = 0x3F
+
+
+def encode_move(move):
+    '''Pack a move in a 16 bit number'''
+    return move.kind << KIND_SHIFT | move.source << SOURCE_SHIFT | move.target << TARGET_SHIFT | move.count
+
+
+def decode_move(code):
+    '''Unpack a move packed by encode_move'''
+    return Move(code >> KIND_SHIFT, code >> SOURCE_SHIFT & PILE_MASK, code >> TARGET_SHIFT & PILE_MASK,
+                code & COUNT_MASK)
+
+# Cards are small integers: the rank (index in CARD_VALUES) in the low
+# 4 bits and the suit (index in CARD_SUITS) in the next 2 bits. Hearts
+# and Diamonds come first, so bit 5 is the colour (0 red, 1 black).
+RANK_MASK = 0x0F
+SUIT_SHIFT = 4
+COLOUR_SHIFT = 5
+ACE = 0
+KING = 12
+
+# Size of a table indexed by two cards
+CARD_CODES = 1 << 6
+
+# Pile of a card that is not dealt yet
+NO_PILE = 0xFF
+
+
+def encode_card(suit, value):
+    '''Return the code of a card from its suit and value names'''
+    return CARD_SUITS.index(suit) << SUIT_SHIFT | CARD_VALUES.index(value)
+
+
+def card_rank(card):
+    '''Return the rank of the card, 0 for an Ace up to 12 for a King'''
+    return card & RANK_MASK
+
+
+def card_suit(card):
+    '''Return the index of the suit of the card'''
+    return card >> SUIT_SHIFT
+
+
+def card_colour(card):
+    '''Return the colour of the card, 0 for red and 1 for black'''
+    return card >> COLOUR_SHIFT
+
+
+def card_name(card):
+    '''Return the value and suit names of a card, e.g. ('K', 'Spades')'''
+    return CARD_VALUES[card_rank(card)], CARD_SUITS[card_suit(card)]
+
+
+def all_cards():
+    '''Return the 52 cards of a deck, in suit and value order'''
+    return [suit << SUIT_SHIFT | rank for suit in range(len(CARD_SUITS)) for rank in range(len(CARD_VALUES))]
+
+
+def _build_tables():
+    '''Precompute the legality of putting a card on another card'''
+    play_table = bytearray(CARD_CODES * CARD_CODES)
+    top_table = bytearray(CARD_CODES * CARD_CODES)
+    for top_card in all_cards():
+        for card in all_cards():
+            index = top_card << 6 | card
+            # One value lower and a different colour on the middle piles
+            play_table[index] = card_colour(top_card) != card_colour(card) and \
+                card_rank(top_card) - 1 == card_rank(card)
+            # Same suit and one value higher on the top piles
+            top_table[index] = card_suit(top_card) == card_suit(card) and \
+                card_rank(top_card) + 1 == card_rank(card)
+    return play_table, top_table
+
+
+# PLAY_TABLE[top_card << 6 | card] is 1 if the card can go on top_card in a
+# middle pile, TOP_TABLE the same for the top piles
+PLAY_TABLE, TOP_TABLE = _build_tables()
+
+# Cards that can go on every card in a middle pile and in a top pile, and
+# the cards that can go on an empty middle pile and top pile
+PLAY_CARDS = [[card for card in all_cards() if PLAY_TABLE[top_card << 6 | card]] for top_card in range(CARD_CODES)]
+TOP_CARDS = [[card for card in all_cards() if TOP_TABLE[top_card << 6 | card]] for top_card in range(CARD_CODES)]
+KINGS = [card for card in all_cards() if card & RANK_MASK == KING]
+ACES = [card for card in all_cards() if card & RANK_MASK == ACE]
+
+# Highest number of cards in a pile
+MAX_PILE_SIZE = 52
+
+
+def _build_zobrist():
+    '''Random 64 bit keys for every card at every place, and for face up cards'''
+    generator = random.Random(0x5017)
+    places = [generator.getrandbits(64) for _ in range(CARD_CODES * PILE_COUNT * MAX_PILE_SIZE)]
+    face_up = [generator.getrandbits(64) for _ in range(CARD_CODES)]
+    return places, face_up
+
+
+# ZOBRIST_PLACES[(card * PILE_COUNT + pile) * MAX_PILE_SIZE + position] is
+# XOR-ed into the hash of the game while the card is there, ZOBRIST_FACE_UP
+# while the card is face up
+ZOBRIST_PLACES, ZOBRIST_FACE_UP = _build_zobrist()
+
+
+def is_play_pile(pile_index):
+    '''Return True for the seven middle piles'''
+    return PLAY_PILE_1 <= pile_index <= PLAY_PILE_7
+
+
+def is_top_pile(pile_index):
+    '''Return True for the four top piles'''
+    return TOP_PILE_1 <= pile_index <= TOP_PILE_4
+
+
+class SolitaireGame:
+    '''State and rules of one game of Solitaire'''
+
+    def __init__(self, hard_mode: bool = False):
+        '''Initialize an empty game'''
+        self.hard_mode = hard_mode
+
+        # Number of cards turned on a click on the face down pile
+        self.draw_count = 3 if hard_mode else 1
+
+        # A list of lists, each holds a pile of cards
+        self.piles = [[] for _ in range(PILE_COUNT)]
+
+        # Cards that are turned face up, indexed by card
+        self.face_up = bytearray(CARD_CODES)
+
+        # Pile of every card and its position in the pile, indexed by card.
+        # Kept up to date on every move so no pile has to be searched
+        self.pile_of = bytearray([NO_PILE]) * CARD_CODES
+        self.position_of = bytearray(CARD_CODES)
+
+        # Zobrist hash of the piles and face up cards, updated on every move
+        self.hash = 0
+
+        # Number of moves the user has made
+        self.moves = 0
+
+        # Moves applied so far and moves undone, packed with encode_move
+        self.history = array('H')
+        self.redo_log = array('H')
+
+    def deal(self, cards):
+        '''Deal the cards, the last card of the list is the top of the deck'''
+        self.piles = [[] for _ in range(PILE_COUNT)]
+        self.face_up = bytearray(CARD_CODES)
+        self.pile_of = bytearray([NO_PILE]) * CARD_CODES
+        self.hash = 0
+        self.moves = 0
+        self.history = array('H')
+        self.redo_log = array('H')
+
+        # Put all the cards in the bottom face down pile
+        for card in cards:
+            self._push(BOTTOM_FACE_DOWN_PILE, card)
+
+        # Loop for each pile and deal the right number of cards
+        for pile_no in range(PLAY_PILE_1, PLAY_PILE_7 + 1):
+            for _ in range(pile_no - PLAY_PILE_1 + 1):
+                self._push(pile_no, self._pop(BOTTOM_FACE_DOWN_PILE))
+
+            # Flip up the top cards
+            self._turn(self.piles[pile_no][-1], 1)
+
+    def restore(self, piles, face_up_cards):
+        '''Put the cards of a saved game back in their piles, with the cards given face up'''
+        self.piles = [[] for _ in range(PILE_COUNT)]
+        self.face_up = bytearray(CARD_CODES)
+        self.pile_of = bytearray([NO_PILE]) * CARD_CODES
+        self.hash = 0
+        for pile_index, pile in enumerate(piles):
+            for card in pile:
+                self._push(pile_index, card)
+        for card in face_up_cards:
+            self._turn(card, 1)
+
+    def copy(self):
+        '''Return a copy of the game in the same position, without its history'''
+        game = SolitaireGame(self.hard_mode)
+        game.piles = [list(pile) for pile in self.piles]
+        game.face_up = bytearray(self.face_up)
+        game.pile_of = bytearray(self.pile_of)
+        game.position_of = bytearray(self.position_of)
+        game.hash = self.hash
+        game.moves = self.moves
+        return game
+
+    def is_face_up(self, card):
+        '''Return True if the card is face up'''
+        return self.face_up[card] == 1
+
+    def _push(self, pile_index, card):
+        '''Put a card on top of a pile and remember where it is'''
+        pile = self.piles[pile_index]
+        self.pile_of[card] = pile_index
+        self.position_of[card] = len(pile)
+        self.hash ^= ZOBRIST_PLACES[(card * PILE_COUNT + pile_index) * MAX_PILE_SIZE + len(pile)]
+        pile.append(card)
+
+    def _pop(self, pile_index):
+        '''Take the top card of a pile'''
+        card = self.piles[pile_index].pop()
+        self.hash ^= ZOBRIST_PLACES[(card * PILE_COUNT + pile_index) * MAX_PILE_SIZE + self.position_of[card]]
+        return card
+
+    def _turn(self, card, face_up):
+        '''Turn a card face up (1) or face down (0)'''
+        if self.face_up[card] != face_up:
+            self.face_up[card] = face_up
+            self.hash ^= ZOBRIST_FACE_UP[card]
+
+    def _move_cards(self, source, target, count):
+        '''Move the top `count` cards of the source pile on the target pile'''
+        source_pile = self.piles[source]
+        start = len(source_pile) - count
+        for card in source_pile[start:]:
+            self.hash ^= ZOBRIST_PLACES[(card * PILE_COUNT + source) * MAX_PILE_SIZE + self.position_of[card]]
+            self._push(target, card)
+        del source_pile[start:]
+
+    def get_pile_for_card(self, card):
+        '''Get the pile for the card'''
+        pile_index = self.pile_of[card]
+        return None if pile_index == NO_PILE else pile_index
+
+    def get_stack(self, card):
+        '''Return the card and all the cards on top of it in its pile'''
+        return self.piles[self.pile_of[card]][self.position_of[card]:]
+
+    def top_card(self, pile_index):
+        '''Return the top card of a pile, or None if the pile is empty'''
+        pile = self.piles[pile_index]
+        return pile[-1] if pile else None
+
+    def can_pick_up(self, card):
+        '''Return the number of cards picked up with the card, 0 if it can't be picked up'''
+        pile_index = self.get_pile_for_card(card)
+        if pile_index is None or pile_index == BOTTOM_FACE_DOWN_PILE or not self.is_face_up(card):
+            return 0
+        count = len(self.piles[pile_index]) - self.position_of[card]
+        # Only the top card of the face up pile and of the top piles can be taken
+        if not is_play_pile(pile_index) and count != 1:
+            return 0
+        return count
+
+    def can_add_to_play_pile(self, card, pile_index):
+        '''Check if a card can be added to a middle play pile'''
+        pile = self.piles[pile_index]
+        if not pile:
+            return card & RANK_MASK == KING
+        top_card = pile[-1]
+        return self.face_up[top_card] == 1 and PLAY_TABLE[top_card << 6 | card] == 1
+
+    def can_add_to_top_pile(self, card, pile_index):
+        '''Check if a card can be added to a top pile'''
+        pile = self.piles[pile_index]
+        if not pile:
+            return card & RANK_MASK == ACE
+        return TOP_TABLE[pile[-1] << 6 | card] == 1
+
+    def can_transfer(self, source, target, count):
+        '''Check if the top `count` cards of the source pile can go on the target pile'''
+        if source == target or count <= 0 or len(self.piles[source]) < count:
+            return False
+        card = self.piles[source][-count]
+        if self.can_pick_up(card) != count:
+            return False
+        if is_play_pile(target):
+            return self.can_add_to_play_pile(card, target)
+        if is_top_pile(target):
+            return count == 1 and self.can_add_to_top_pile(card, target)
+        return False
+
+    def top_pile_for(self, card):
+        '''Return the first top pile the card can be added to, or None'''
+        pile_index = self.get_pile_for_card(card)
+        if pile_index is None or self.top_card(pile_index) != card or not self.is_face_up(card):
+            return None
+        for top_pile_index in range(TOP_PILE_1, TOP_PILE_4 + 1):
+            if top_pile_index != pile_index and self.can_add_to_top_pile(card, top_pile_index):
+                return top_pile_index
+        return None
+
+    def draw_move(self):
+        '''Return the move made by a click on the face down pile, or None'''
+        if self.piles[BOTTOM_FACE_DOWN_PILE]:
+            count = min(self.draw_count, len(self.piles[BOTTOM_FACE_DOWN_PILE]))
+            return Move(DRAW, BOTTOM_FACE_DOWN_PILE, BOTTOM_FACE_UP_PILE, count)
+        if self.piles[BOTTOM_FACE_UP_PILE]:
+            return Move(RECYCLE, BOTTOM_FACE_UP_PILE, BOTTOM_FACE_DOWN_PILE, len(self.piles[BOTTOM_FACE_UP_PILE]))
+        return None
+
+    def _cards_for(self, target):
+        '''Return the cards that can go on the target pile, wherever they are'''
+        target_pile = self.piles[target]
+        if is_top_pile(target):
+            return TOP_CARDS[target_pile[-1]] if target_pile else ACES
+        if not is_play_pile(target):
+            return ()
+        if not target_pile:
+            return KINGS
+        top_card = target_pile[-1]
+        return PLAY_CARDS[top_card] if self.face_up[top_card] else ()
+
+    def moves_between(self, source, target):
+        '''Return the legal moves of cards from the source pile to the target pile'''
+        moves = []
+        if source == target:
+            return moves
+        pile = self.piles[source]
+        for card in self._cards_for(target):
+            if self.pile_of[card] != source or not self.face_up[card]:
+                continue
+            count = len(pile) - self.position_of[card]
+            # Only the top card can leave the face up pile and the top
+            # piles, and only the top card goes on a top pile
+            if count == 1 or (is_play_pile(source) and is_play_pile(target)):
+                moves.append(Move(TRANSFER, source, target, count))
+        return moves
+
+    def legal_moves(self):
+        '''Return all the moves that can be made now'''
+        moves = []
+        draw = self.draw_move()
+        if draw is not None:
+            moves.append(draw)
+
+        for pile_index in range(PLAY_PILE_1, PLAY_PILE_7 + 1):
+            top_card = self.top_card(pile_index)
+            if top_card is not None and not self.is_face_up(top_card):
+                moves.append(Move(FLIP, pile_index, pile_index, 1))
+
+        # Only the piles with a face up card that goes on the target are
+        # looked at, the moves are sorted by source pile like the hints
+        transfers = []
+        for target in range(PLAY_PILE_1, PILE_COUNT):
+            sources = {self.pile_of[card] for card in self._cards_for(target) if self.face_up[card]}
+            for source in sources:
+                transfers.extend(self.moves_between(source, target))
+        transfers.sort(key=attrgetter('source'))
+        moves.extend(transfers)
+        return moves
+
+    def is_legal(self, move):
+        '''Check if a move can be made now'''
+        if move.kind in (DRAW, RECYCLE):
+            return move == self.draw_move()
+        if move.kind == FLIP:
+            top_card = self.top_card(move.source)
+            return is_play_pile(move.source) and top_card is not None and not self.is_face_up(top_card)
+        return move.kind == TRANSFER and self.can_transfer(move.source, move.target, move.count)
+
+    def apply(self, move):
+        '''Make a move, the move must be legal'''
+        self._make(move)
+        self.history.append(encode_move(move))
+        if self.redo_log:
+            del self.redo_log[:]
+
+    def _make(self, move):
+        '''Change the piles for a move'''
+        if move.kind == DRAW:
+            for _ in range(move.count):
+                card = self._pop(BOTTOM_FACE_DOWN_PILE)
+                self._turn(card, 1)
+                self._push(BOTTOM_FACE_UP_PILE, card)
+            self.moves += move.count
+        elif move.kind == RECYCLE:
+            # Flip the deck back over so we can restart
+            while self.piles[BOTTOM_FACE_UP_PILE]:
+                card = self._pop(BOTTOM_FACE_UP_PILE)
+                self._turn(card, 0)
+                self._push(BOTTOM_FACE_DOWN_PILE, card)
+            self.moves += 1
+        elif move.kind == FLIP:
+            self._turn(self.piles[move.source][-1], 1)
+        else:
+            self._move_cards(move.source, move.target, move.count)
+            self.moves += 1
+
+    def undo(self):
+        '''Undo the last move, return it or None if there is nothing to undo'''
+        if not self.history:
+            return None
+        code = self.history.pop()
+        self.redo_log.append(code)
+        move = decode_move(code)
+        if move.kind == DRAW:
+            for _ in range(move.count):
+                card = self._pop(BOTTOM_FACE_UP_PILE)
+                self._turn(card, 0)
+                self._push(BOTTOM_FACE_DOWN_PILE, card)
+            self.moves -= move.count
+        elif move.kind == RECYCLE:
+            while self.piles[BOTTOM_FACE_DOWN_PILE]:
+                card = self._pop(BOTTOM_FACE_DOWN_PILE)
+                self._turn(card, 1)
+                self._push(BOTTOM_FACE_UP_PILE, card)
+            self.moves -= 1
+        elif move.kind == FLIP:
+            self._turn(self.piles[move.source][-1], 0)
+        else:
+            self._move_cards(move.target, move.source, move.count)
+            self.moves -= 1
+        return move
+
+    def redo(self):
+        '''Make again the last move undone, return it or None if there is nothing to redo'''
+        if not self.redo_log:
+            return None
+        code = self.redo_log.pop()
+        move = decode_move(code)
+        self._make(move)
+        self.history.append(code)
+        return move
+
+    def is_won(self):
+        '''Check if all the cards are on the top piles'''
+        for pile in self.piles[TOP_PILE_1:]:
+            if len(pile) != 13:
+                return False
+        return True
+
+    def can_auto_complete(self):
+        '''Check if the game can be finished without the player
+
+        Once the deck is used up and every card of the play piles is face
+        up, the lowest card left is always on top of its pile and goes on
+        its top pile, so the game is won.
+        '''
+        if self.piles[BOTTOM_FACE_DOWN_PILE] or self.piles[BOTTOM_FACE_UP_PILE] or self.is_won():
+            return False
+        for pile in self.piles[PLAY_PILE_1:PLAY_PILE_7 + 1]:
+            if pile and not self.face_up[pile[0]]:
+                return False
+        return True
+
+    def auto_complete(self):
+        '''Move every card to the top piles at once and return the moves made'''
+        moves = []
+        while not self.is_won():
+            # The card of lowest rank on top of a play pile can always move
+            best = None
+            for pile_index in range(PLAY_PILE_1, PLAY_PILE_7 + 1):
+                pile = self.piles[pile_index]
+                if pile and (best is None or pile[-1] & RANK_MASK < self.piles[best][-1] & RANK_MASK):
+                    best = pile_index
+            move = Move(TRANSFER, best, self.top_pile_for(self.piles[best][-1]), 1)
+            self.apply(move)
+            moves.append(move)
+        return moves
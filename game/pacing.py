@@ -0,0 +1,100 @@
+'''
+Frame pacing of the Solitaire Game
+
+pyglet draws the window 60 times a second, even when nothing on it
+changed. A PacedWindow keeps the last frame on screen instead: a view
+that has nothing new to draw calls keep_last_frame() at the start of its
+on_draw, and the frame is neither drawn nor shown. Views that never call
+it are drawn every frame as before.
+
+The view wakes the window up on input and while something moves, and
+invalidates it for a single frame when only a small part changed (the
+timer, once a second). After IDLE_DELAY seconds without waking up the
+window updates and draws only every IDLE_FRAME_TIME seconds, so a game
+left open uses almost no CPU or GPU.
+'''
+
+import time
+import arcade
+import pyglet
+
+# Seconds between two frames, while something moves
+FRAME_TIME = 1 / 60
+
+# Seconds between two frames once nothing moves
+IDLE_FRAME_TIME = 0.1
+
+# Seconds without input or anything moving before the window slows down
+IDLE_DELAY = 1.0
+
+
+class PacedWindow(arcade.Window):
+    '''Window that only draws a frame when the view has something new to show'''
+
+    def __init__(self, *args, paced: bool = True, **kwargs):
+        '''Create the window, every frame is drawn if not paced'''
+        super().__init__(*args, update_rate=FRAME_TIME, **kwargs)
+        self.paced = paced
+
+        # The next frame has to be drawn
+        self.invalid = True
+
+        # The view kept the last frame, it is not shown again
+        self.frame_kept = False
+
+        # Slowed down, and the last time the window was woken up
+        self.idle = False
+        self.last_wake = time.perf_counter()
+
+    def invalidate(self):
+        '''Draw the next frame, the window stays as slow as it is'''
+        self.invalid = True
+
+    def wake(self):
+        '''Draw the next frames at full speed, after input or while something moves'''
+        self.invalid = True
+        self.last_wake = time.perf_counter()
+        if self.idle:
+            self.idle = False
+            self.set_frame_time(FRAME_TIME)
+
+    def keep_last_frame(self):
+        '''Return True if nothing changed since the last frame, the view draws nothing then'''
+        if self.invalid or not self.paced:
+            return False
+        self.frame_kept = True
+        return True
+
+    def set_frame_time(self, frame_time):
+        '''Update and draw the window every frame_time seconds'''
+        self.set_update_rate(frame_time)
+        # The frames are drawn by the event loop of pyglet, not there headless
+        event_loop = pyglet.app.event_loop
+        if event_loop.is_running:
+            pyglet.clock.unschedule(event_loop._redraw_windows)
+            pyglet.clock.schedule_interval(event_loop._redraw_windows, frame_time)
+
+    def flip(self):
+        '''Show the frame drawn, or leave the last one on screen'''
+        if not self.frame_kept:
+            self.invalid = False
+            super().flip()
+            return
+        self.frame_kept = False
+        if not self.idle and time.perf_counter() - self.last_wake > IDLE_DELAY:
+            self.idle = True
+            self.set_frame_time(IDLE_FRAME_TIME)
+
+    def show_view(self, new_view):
+        '''Show a view, from its first frame'''
+        super().show_view(new_view)
+        self.wake()
+
+    def on_resize(self, width, height):
+        '''Draw the window again at its new size'''
+        super().on_resize(width, height)
+        self.wake()
+
+    def on_expose(self):
+        '''Draw the window again, part of it was covered'''
+        self.wake()
@@ -0,0 +1,198 @@
+'''
+Profiler of the Solitaire Game
+
+Started with python game/game.py --profile, it measures every on_draw,
+on_update and mouse handler of the views, and counts the draw calls and
+texture loads of every frame. F3 shows the overlay with the 50th, 95th
+and 99th percentile of the last frames, F4 starts recording every handler
+call and, pressed again, writes them to a trace file in
+~/.solitaire/traces that chrome://tracing or ui.perfetto.dev can open.
+
+Without --profile nothing of this is installed and the game runs as is.
+'''
+
+import json
+import time
+import types
+from collections import deque
+import arcade
+from arcade.gl import Geometry
+from pyglet.graphics import vertexdomain
+from resources import user_data_path
+from card import texture_load_count
+
+# Handlers measured on every view
+HANDLERS = ('on_draw', 'on_update', 'on_mouse_press', 'on_mouse_release', 'on_mouse_motion')
+
+# Calls of a handler the percentiles are taken from
+SAMPLES = 300
+
+# Seconds between two updates of the overlay text
+OVERLAY_REFRESH = 0.5
+
+
+def percentile(ordered, fraction):
+    '''Return a percentile of a sorted list'''
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Profiler:
+    '''Measures the handlers of the views shown in a window'''
+
+    def __init__(self):
+        '''Initialize the profiler, nothing is measured before install()'''
+        # Last durations of every handler, by "View.handler"
+        self.samples = {}
+
+        # Draw calls in total, draw calls and texture loads in the last
+        # frames. The textures are counted by the card module itself
+        self.draw_calls = 0
+        self.frame_draw_calls = deque(maxlen=SAMPLES)
+        self.frame_texture_loads = deque(maxlen=SAMPLES)
+        self.frame = 0
+
+        # Events recorded for the trace, None when not recording
+        self.trace = None
+        self.trace_start = 0
+
+        self.visible = False
+        self.overlay = None
+        self.next_refresh = 0
+
+    def install(self, window: arcade.Window):
+        '''Measure every view the window shows from now on'''
+        self._count_calls()
+
+        show_view = window.show_view
+
+        def profiled_show_view(view):
+            self.attach(view)
+            show_view(view)
+        window.show_view = profiled_show_view
+
+        # Views return nothing from on_key_press, so the keys get here too
+        window.push_handlers(on_key_press=self.on_key_press, on_close=self.on_close)
+        self.overlay = arcade.Text("", 10, window.height - 10, arcade.color.YELLOW, 11, width=window.width - 20,
+                                   anchor_y="top", multiline=True, font_name=("Courier New", "monospace"))
+
+    def _count_calls(self):
+        '''Count the draw calls'''
+        profiler = self
+
+        def counted(function):
+            def counting(*args, **kwargs):
+                profiler.draw_calls += 1
+                return function(*args, **kwargs)
+            return counting
+
+        Geometry.render = counted(Geometry.render)
+        for domain in (vertexdomain.VertexDomain, vertexdomain.IndexedVertexDomain):
+            domain.draw = counted(domain.draw)
+            domain.draw_subset = counted(domain.draw_subset)
+
+    def attach(self, view: arcade.View):
+        '''Measure the handlers of a view'''
+        for name in HANDLERS:
+            handler = getattr(view, name, None)
+            if handler is not None and not hasattr(handler, 'profiled'):
+                wrap = self._wrap_draw if name == 'on_draw' else self._wrap
+                profiled = wrap(f"{type(view).__name__}.{name}", handler)
+                profiled.profiled = True
+                # The window only takes handlers that are methods of the view
+                setattr(view, name, types.MethodType(profiled, view))
+
+    def _record(self, label, start, end):
+        '''Keep the duration of a handler call'''
+        samples = self.samples.get(label)
+        if samples is None:
+            samples = self.samples[label] = deque(maxlen=SAMPLES)
+        samples.append(end - start)
+        if self.trace is not None:
+            self.trace.append({'name': label, 'ph': 'X', 'pid': 1, 'tid': 1, 'args': {'frame': self.frame},
+                               'ts': (start - self.trace_start) * 1e6, 'dur': (end - start) * 1e6})
+
+    def _wrap(self, label, handler):
+        '''Return the handler, measured'''
+        def profiled(view, *args, **kwargs):
+            start = time.perf_counter()
+            result = handler(*args, **kwargs)
+            self._record(label, start, time.perf_counter())
+            return result
+        return profiled
+
+    def _wrap_draw(self, label, handler):
+        '''Return the on_draw handler, measured, with the end of the frame counted after it'''
+        def profiled(view, *args, **kwargs):
+            draw_calls = self.draw_calls
+            texture_loads = texture_load_count()
+            start = time.perf_counter()
+            result = handler(*args, **kwargs)
+            end = time.perf_counter()
+            self._record(label, start, end)
+            self.end_frame(end, self.draw_calls - draw_calls, texture_load_count() - texture_loads)
+            return result
+        return profiled
+
+    def end_frame(self, now, draw_calls, texture_loads):
+        '''Count a frame and draw the overlay over it'''
+        self.frame_draw_calls.append(draw_calls)
+        self.frame_texture_loads.append(texture_loads)
+        if self.trace is not None:
+            self.trace.append({'name': 'frame', 'ph': 'C', 'pid': 1, 'ts': (now - self.trace_start) * 1e6,
+                               'args': {'draw calls': draw_calls, 'texture loads': texture_loads}})
+        self.frame += 1
+
+        if self.visible:
+            if now >= self.next_refresh:
+                self.next_refresh = now + OVERLAY_REFRESH
+                self.overlay.text = self.report()
+            # Not counted, the overlay is not part of the game
+            draw_calls = self.draw_calls
+            self.overlay.draw()
+            self.draw_calls = draw_calls
+
+    def report(self):
+        '''Return the percentiles of every handler, in milliseconds'''
+        lines = [f"{'handler':<32}{'p50':>8}{'p95':>8}{'p99':>8}  ms"]
+        for label in sorted(self.samples):
+            ordered = sorted(self.samples[label])
+            lines.append(f"{label:<32}" + "".join(f"{percentile(ordered, fraction) * 1000:>8.2f}"
+                                                  for fraction in (0.50, 0.95, 0.99)))
+        if self.frame_draw_calls:
+            ordered = sorted(self.frame_draw_calls)
+            lines.append(f"draw calls per frame: p50 {percentile(ordered, 0.5)} max {ordered[-1]}")
+        lines.append(f"texture loads this game: {texture_load_count()} "
+                     f"({sum(self.frame_texture_loads)} in the last frames)")
+        if self.trace is not None:
+            lines.append(f"F4: recording, {len(self.trace)} events")
+        return "\n".join(lines)
+
+    def start_recording(self):
+        '''Start recording every handler call'''
+        self.trace = []
+        self.trace_start = time.perf_counter()
+
+    def stop_recording(self):
+        '''Write the recorded calls to a trace file and return its path'''
+        path = user_data_path("traces", f"trace-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, "w") as trace_file:
+            json.dump({'traceEvents': self.trace, 'displayTimeUnit': 'ms'}, trace_file)
+        self.trace = None
+        print(f"Trace written to {path}")
+        return path
+
+    def on_key_press(self, symbol: int, modifiers: int):
+        '''F3 shows or hides the overlay, F4 starts or stops recording'''
+        if symbol == arcade.key.F3:
+            self.visible = not self.visible
+            self.next_refresh = 0
+        elif symbol == arcade.key.F4:
+            if self.trace is None:
+                self.start_recording()
+            else:
+                self.stop_recording()
+
+    def on_close(self):
+        '''Write the trace being recorded when the window is closed'''
+        if self.trace is not None:
+            self.stop_recording()
@@ -0,0 +1,162 @@
+'''
+Replays of games of the Solitaire Game
+
+A replay is the deal number and mode followed by every move, packed in
+2 bytes with encode_move, plus two codes for undo and redo. The file is
+only ever appended to, and the moves are written in batches so the input
+handlers never wait for the disk.
+
+Layout of a replay file:
+    header  10 bytes  b"SOLR", version, hard mode, deal number (uint32)
+    moves   2 bytes per move (little endian)
+
+Replays can be played back in the window (python game/game.py --replay
+FILE) or without a window, many of them at once, to check that the rules
+still give the same games (python game/replay.py FILE...).
+'''
+
+import argparse
+import glob
+import os
+import struct
+import sys
+import time
+from array import array
+from deals import get_deal
+from model import SolitaireGame, decode_move
+from resources import user_data_path
+
+MAGIC = b"SOLR"
+VERSION = 1
+HEADER = struct.Struct("<4sBBI")
+
+# Codes that are not moves, for the undo and redo keys
+UNDO = 0xFFFF
+REDO = 0xFFFE
+
+# Moves kept in memory before they are written
+BATCH_SIZE = 64
+
+
+def replay_folder():
+    '''Folder where the games are recorded'''
+    return os.path.dirname(user_data_path("replays", "replay"))
+
+
+class ReplayRecorder:
+    '''Records the moves of a game to a replay file'''
+
+    def __init__(self, path, deal_number, hard_mode: bool):
+        '''Create the replay file and write its header, FileExistsError if it is there'''
+        self.path = path
+        self.file = open(path, "xb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, hard_mode, deal_number & 0xFFFFFFFF))
+        self.pending = array('H')
+
+    def record(self, code):
+        '''Record a move (packed with encode_move), UNDO or REDO'''
+        self.pending.append(code)
+        if len(self.pending) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        '''Write the moves kept in memory'''
+        if not self.pending:
+            return
+        if sys.byteorder == "big":
+            self.pending.byteswap()
+        self.file.write(self.pending.tobytes())
+        self.file.flush()
+        self.pending = array('H')
+
+    def close(self):
+        '''Write what is left and close the file'''
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+
+
+def new_recorder(deal_number, hard_mode: bool):
+    '''Start recording a new game in the replay folder'''
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{deal_number}-{'hard' if hard_mode else 'normal'}"
+    # Games of the same deal started in the same second get a number
+    number = 1
+    while True:
+        suffix = "" if number == 1 else f"-{number}"
+        try:
+            return ReplayRecorder(os.path.join(replay_folder(), f"{name}{suffix}.rep"), deal_number, hard_mode)
+        except FileExistsError:
+            number += 1
+
+
+def read_replay(path):
+    '''Return the deal number, mode and codes of a replay file'''
+    with open(path, "rb") as replay_file:
+        data = replay_file.read()
+    magic, version, hard_mode, deal_number = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a replay")
+    codes = array('H')
+    # A game that was cut short may have written half a record
+    end = HEADER.size + (len(data) - HEADER.size) // 2 * 2
+    codes.frombytes(data[HEADER.size:end])
+    if sys.byteorder == "big":
+        codes.byteswap()
+    return deal_number, bool(hard_mode), codes
+
+
+def step(game, code):
+    '''Play one code of a replay on the game, return the move made or undone'''
+    if code == UNDO:
+        return game.undo()
+    if code == REDO:
+        return game.redo()
+    move = decode_move(code)
+    if not game.is_legal(move):
+        raise ValueError(f"illegal move in replay: {move}")
+    game.apply(move)
+    return move
+
+
+def play_replay(deal_number, hard_mode, codes, catalogue=None):
+    '''Play a whole replay without a window and return the game'''
+    game = SolitaireGame(hard_mode)
+    game.deal(get_deal(deal_number, catalogue))
+    for code in codes:
+        step(game, code)
+    return game
+
+
+def main():
+    '''Play replays without a window, as fast as possible'''
+    parser = argparse.ArgumentParser(description="Play Solitaire replays without a window")
+    parser.add_argument("files", nargs="*", help="replay files, all the recorded games if none")
+    parser.add_argument("--repeat", type=int, default=1, help="play every replay this many times")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(replay_folder(), "*.rep")))
+    replays = [(path, read_replay(path)) for path in files]
+
+    start = time.perf_counter()
+    games = won = moves = failed = 0
+    for _ in range(args.repeat):
+        for path, replay in replays:
+            try:
+                game = play_replay(*replay)
+            except ValueError as error:
+                print(f"{path}: {error}")
+                failed += 1
+                continue
+            games += 1
+            won += game.is_won()
+            moves += len(replay[2])
+    elapsed = time.perf_counter() - start
+
+    rate = games / elapsed if elapsed > 0 else 0
+    print(f"Played {games} games ({moves} moves, {won} won, {failed} failed) "
+          f"in {elapsed:.2f}s, {rate:.0f} games/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+'''
+Paths to the files shipped with the Solitaire Game and to the files it saves
+'''
+
+import os
+import sys
+
+# Function to get the correct path to resources
+def resource_path(relative_path):
+    """ Get the absolute path to the resource, works for dev and PyInstaller """
+    try:
+        # PyInstaller creates a temp folder and stores path in _MEIPASS
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+
+    return os.path.join(base_path, relative_path)
+
+# Folder of the files written by the game (replays, statistics, saves)
+USER_DATA_FOLDER = os.path.join(os.path.expanduser("~"), ".solitaire")
+
+def user_data_path(*parts):
+    """ Get the path to a file written by the game, creating its folder """
+    path = os.path.join(USER_DATA_FOLDER, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
@@ -0,0 +1,180 @@
+'''
+Saved game of the Solitaire Game
+
+The game in progress is saved after every move, so it can be continued
+after the window was closed, R was pressed or the machine was turned off.
+A save is the piles as they are, not the deal and the moves, so a game
+is resumed without dealing it again:
+
+    header  26 bytes  b"SOLG", version, hard mode | language << 1, deal
+                      number (uint32), moves (uint32), seconds (float),
+                      history and redo lengths (uint32)
+    piles   13 bytes  number of cards in every pile
+    cards   52 bytes  every card from the bottom of the first pile,
+                      0x80 set when it is face up
+    moves   2 bytes   per move of the history, then of the redo log
+
+A game of a few hundred moves is saved in a few hundred bytes. The file is
+written by a background thread, and only the last save is written when
+the moves come faster than the disk.
+'''
+
+import os
+import struct
+import sys
+import threading
+from array import array
+from model import SolitaireGame, PILE_COUNT
+from resources import user_data_path
+
+MAGIC = b"SOLG"
+VERSION = 2
+HEADER = struct.Struct("<4sBBIIfII")
+
+LANGUAGES = ["EN", "RO"]
+FACE_UP = 0x80
+CARD_MASK = 0x3F
+
+
+def pack_game(game: SolitaireGame, deal_number, language, seconds):
+    '''Return the save of a game in progress'''
+    cards = bytearray()
+    for pile in game.piles:
+        cards.extend(card | FACE_UP if game.is_face_up(card) else card for card in pile)
+    header = HEADER.pack(MAGIC, VERSION, game.hard_mode | LANGUAGES.index(language) << 1,
+                         deal_number & 0xFFFFFFFF, game.moves, seconds, len(game.history), len(game.redo_log))
+    moves = game.history + game.redo_log
+    if sys.byteorder == "big":
+        moves.byteswap()
+    return header + bytes(len(pile) for pile in game.piles) + cards + moves.tobytes()
+
+
+def unpack_game(data):
+    '''Return the game, deal number, language and seconds played of a save'''
+    magic, version, flags, deal_number, moves, seconds, history_length, redo_length = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a saved game")
+    sizes = data[HEADER.size:HEADER.size + PILE_COUNT]
+    start = HEADER.size + PILE_COUNT
+    piles = []
+    for size in sizes:
+        piles.append([card & CARD_MASK for card in data[start:start + size]])
+        start += size
+    face_up_cards = [card & CARD_MASK for card in data[HEADER.size + PILE_COUNT:start] if card & FACE_UP]
+
+    game = SolitaireGame(bool(flags & 1))
+    game.restore(piles, face_up_cards)
+    game.moves = moves
+    codes = array('H', data[start:start + 2 * (history_length + redo_length)])
+    if len(codes) != history_length + redo_length:
+        raise ValueError("saved game cut short")
+    if sys.byteorder == "big":
+        codes.byteswap()
+    game.history = codes[:history_length]
+    game.redo_log = codes[history_length:]
+    return game, deal_number, LANGUAGES[flags >> 1], seconds
+
+
+class Autosaver:
+    '''Writes the last save of the game in progress from a background thread'''
+
+    def __init__(self, path):
+        '''Start the thread that writes the saves'''
+        self.path = path
+
+        # Save waiting to be written, b"" to delete the file, None for nothing
+        self.pending = None
+        self.closing = False
+        self.condition = threading.Condition()
+
+        # Last save made or read in this run, b"" for none, None before
+        # the file is read
+        self.latest = None
+
+        self.writer = threading.Thread(target=self.write_saves, name="autosave", daemon=True)
+        self.writer.start()
+
+    def save(self, data):
+        '''Save the game, replacing a save still waiting to be written'''
+        with self.condition:
+            self.latest = data
+            self.pending = data
+            self.condition.notify()
+
+    def discard(self):
+        '''Delete the save, the game is over'''
+        self.save(b"")
+
+    def saved_game(self):
+        '''Return the last save, from this run or from the file, or None'''
+        # The file is first read by the preloader thread, a save made meanwhile waits
+        with self.condition:
+            if self.latest is None:
+                # Read once, the saves of this run are kept in memory
+                try:
+                    with open(self.path, "rb") as save_file:
+                        self.latest = save_file.read()
+                except OSError:
+                    self.latest = b""
+            data = self.latest
+        if not data:
+            return None
+        try:
+            return unpack_game(data)
+        except (ValueError, struct.error, IndexError):
+            return None
+
+    def write_saves(self):
+        '''Write the saves as they come, in the writer thread'''
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closing:
+                    self.condition.wait()
+                data, self.pending = self.pending, None
+                if data is None:
+                    return
+            self.write(data)
+
+    def write(self, data):
+        '''Replace the save file, it is never left half written'''
+        if not data:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "wb") as save_file:
+            save_file.write(data)
+            save_file.flush()
+            # The machine may be turned off right after
+            os.fsync(save_file.fileno())
+        os.replace(temporary_path, self.path)
+
+    def close(self):
+        '''Write the save waiting and stop the writer'''
+        with self.condition:
+            self.closing = True
+            self.condition.notify()
+        self.writer.join()
+
+
+# Saves of the player, opened the first time they are needed, by the
+# preloader thread or the views
+_autosaver = None
+_autosaver_lock = threading.Lock()
+
+
+def open_autosaver():
+    '''Return the autosaver of the game in progress'''
+    global _autosaver
+    with _autosaver_lock:
+        if _autosaver is None:
+            _autosaver = Autosaver(user_data_path("saves", "game.sav"))
+        return _autosaver
+
+
+def close_autosaver():
+    '''Write the save waiting, if a game was saved'''
+    global _autosaver
+    if _autosaver is not None:
+        _autosaver.close()
+        _autosaver = None
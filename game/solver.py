@@ -0,0 +1,240 @@
+'''
+Solver that finds out if a deal of the Solitaire Game can be won
+
+It plays the deal on a SolitaireGame with a depth-first search. Positions
+already searched are remembered by their Zobrist hash in a fixed size
+transposition table, and safe moves to the top piles are made without
+trying the alternatives.
+'''
+
+import argparse
+import time
+from collections import namedtuple
+from deals import deal_for_seed
+from model import SolitaireGame, card_rank, card_suit, card_name, is_play_pile, is_top_pile, \
+    DRAW, RECYCLE, FLIP, TRANSFER, KING, TOP_PILE_1, TOP_PILE_4, BOTTOM_FACE_UP_PILE
+
+# Results of a search
+WIN = 'win'
+LOSS = 'loss'
+UNKNOWN = 'unknown'
+
+# Result of a search, `moves` is the list of moves that wins the deal
+SolveResult = namedtuple('SolveResult', ['status', 'moves', 'nodes', 'seconds'])
+
+# Limits of a search, after them the result is UNKNOWN
+MAX_NODES = 500_000
+MAX_DEPTH = 2_000
+TIME_LIMIT = 60.0
+
+
+class TranspositionTable:
+    '''Fixed size table of the hashes of the positions already searched'''
+
+    def __init__(self, size_bits: int = 20):
+        '''Initialize an empty table of 2 ** size_bits slots'''
+        self.mask = (1 << size_bits) - 1
+        self.slots = [0] * (1 << size_bits)
+
+        # Number of positions that pushed out another one
+        self.replaced = 0
+
+    def __contains__(self, key):
+        '''Return True if the position is in the table'''
+        return self.slots[key & self.mask] == key
+
+    def add(self, key):
+        '''Store a position, it replaces whatever was in its slot'''
+        index = key & self.mask
+        if self.slots[index] != 0:
+            self.replaced += 1
+        self.slots[index] = key
+
+
+def top_pile_heights(game):
+    '''Return the number of cards on the top piles for each suit'''
+    heights = [0, 0, 0, 0]
+    for pile_index in range(TOP_PILE_1, TOP_PILE_4 + 1):
+        pile = game.piles[pile_index]
+        if pile:
+            heights[card_suit(pile[0])] = len(pile)
+    return heights
+
+
+def is_safe(game, move, heights):
+    '''Check if a move to a top pile can never be a mistake'''
+    if move.source == BOTTOM_FACE_UP_PILE and game.hard_mode:
+        # Taking a card out of the face up pile changes which cards
+        # come up when drawing 3, so it is not always safe
+        return False
+    card = game.piles[move.source][-1]
+    rank = card_rank(card)
+    if rank <= 1:
+        return True
+    # Nobody needs the card once both cards one lower of the other colour
+    # are on the top piles (suits 0 and 1 are red, 2 and 3 black)
+    other = 2 if card_suit(card) < 2 else 0
+    return heights[other] >= rank and heights[other + 1] >= rank
+
+
+def ordered_moves(game, moves=None):
+    '''Return the moves worth trying in a position, most promising first'''
+    if moves is None:
+        moves = game.legal_moves()
+
+    scored = []
+    heights = None
+    for move in moves:
+        if move.kind == FLIP:
+            # Turning a card is free and always good
+            return [move]
+        if move.kind == TRANSFER and is_top_pile(move.target) and not is_top_pile(move.source):
+            if heights is None:
+                heights = top_pile_heights(game)
+            if is_safe(game, move, heights):
+                return [move]
+            scored.append((0, move))
+        elif move.kind == TRANSFER and is_play_pile(move.source):
+            card = game.piles[move.source][-move.count]
+            position = game.position_of[card]
+            if position == 0:
+                # Moving a King from an empty pile to another one is useless
+                if card_rank(card) == KING and not game.piles[move.target]:
+                    continue
+                scored.append((1, move))
+            elif not game.is_face_up(game.piles[move.source][position - 1]):
+                scored.append((1, move))
+            else:
+                scored.append((3, move))
+        elif move.kind == TRANSFER and move.source == BOTTOM_FACE_UP_PILE:
+            scored.append((2, move))
+        elif move.kind in (DRAW, RECYCLE):
+            scored.append((4, move))
+        else:
+            scored.append((5, move))
+    scored.sort(key=lambda item: item[0])
+    return [move for _, move in scored]
+
+
+def search(game, max_nodes: int = MAX_NODES, max_depth: int = MAX_DEPTH, time_limit: float = TIME_LIMIT,
+           table_bits: int = 20, yield_every: int = 0):
+    '''Search for a win from the position of the game, returns a SolveResult
+
+    This is a generator, the SolveResult is the value of its StopIteration.
+    With `yield_every` set it yields the number of nodes every `yield_every`
+    nodes, so the search can be spread over several frames. The game is
+    changed during the search and is back to its position at the end.
+    A time_limit of None means no time limit.
+    '''
+    start = time.perf_counter()
+    depth = len(game.history)
+    if game.is_won():
+        return SolveResult(WIN, [], 0, 0.0)
+
+    table = TranspositionTable(table_bits)
+    table.add(game.hash)
+
+    # Hashes of the positions on the current line, the table may lose them
+    on_path = {game.hash}
+    path = []
+    frames = [iter(ordered_moves(game))]
+    nodes = 0
+    complete = True
+    result = None
+
+    while frames:
+        move = next(frames[-1], None)
+        if move is None:
+            # All the moves of this position were tried, go back one move
+            frames.pop()
+            if path:
+                on_path.discard(game.hash)
+                game.undo()
+                path.pop()
+            continue
+
+        game.apply(move)
+        if game.hash in on_path or game.hash in table:
+            game.undo()
+            continue
+
+        nodes += 1
+        if nodes >= max_nodes or (nodes & 0x3FF == 0 and time_limit is not None and
+                                  time.perf_counter() - start > time_limit):
+            game.undo()
+            result = SolveResult(UNKNOWN, [], nodes, time.perf_counter() - start)
+            break
+        if len(path) + 1 >= max_depth:
+            complete = False
+            game.undo()
+            continue
+
+        table.add(game.hash)
+        on_path.add(game.hash)
+        path.append(move)
+        if game.is_won():
+            result = SolveResult(WIN, list(path), nodes, time.perf_counter() - start)
+            break
+        frames.append(iter(ordered_moves(game)))
+
+        if yield_every and nodes % yield_every == 0:
+            yield nodes
+
+    # Put the game back where the search started
+    while len(game.history) > depth:
+        game.undo()
+    if result is None:
+        result = SolveResult(LOSS if complete else UNKNOWN, [], nodes, time.perf_counter() - start)
+    return result
+
+
+def solve(deal, hard_mode: bool = False, max_nodes: int = MAX_NODES, max_depth: int = MAX_DEPTH,
+          time_limit: float = TIME_LIMIT, table_bits: int = 20):
+    '''Find out if a deal can be won, with the moves that win it'''
+    game = SolitaireGame(hard_mode)
+    game.deal(deal)
+    steps = search(game, max_nodes, max_depth, time_limit, table_bits)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+def describe_move(game, move):
+    '''Return a short text for a move made in the game'''
+    if move.kind == DRAW:
+        return f"draw {move.count}"
+    if move.kind == RECYCLE:
+        return "turn the deck over"
+    if move.kind == FLIP:
+        return f"flip pile {move.source}"
+    value, suit = card_name(game.piles[move.source][-move.count])
+    return f"{value} of {suit} ({move.count} cards) from pile {move.source} to pile {move.target}"
+
+
+def main():
+    '''Solve one deal from the command line'''
+    parser = argparse.ArgumentParser(description="Find out if a Solitaire deal can be won")
+    parser.add_argument("seed", type=int, help="seed of the deal")
+    parser.add_argument("--hard", action="store_true", help="draw 3 cards instead of 1")
+    parser.add_argument("--max-nodes", type=int, default=MAX_NODES)
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT)
+    parser.add_argument("--moves", action="store_true", help="print the winning moves")
+    args = parser.parse_args()
+
+    deal = deal_for_seed(args.seed)
+    result = solve(deal, args.hard, max_nodes=args.max_nodes, time_limit=args.time_limit)
+    print(f"Deal {args.seed}: {result.status}, {result.nodes} nodes in {result.seconds:.2f}s, "
+          f"{len(result.moves)} moves")
+
+    if args.moves and result.status == WIN:
+        game = SolitaireGame(args.hard)
+        game.deal(deal)
+        for move in result.moves:
+            print(describe_move(game, move))
+            game.apply(move)
+
+
+if __name__ == "__main__":
+    main()
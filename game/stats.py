@@ -0,0 +1,173 @@
+'''
+Statistics of the Solitaire Game
+
+Every game won or left is appended to a history file, and the totals of
+every mode (games, wins, best time, streaks) are kept up to date in a
+small summary file next to it, so the statistics screen shows them
+without reading the history. Both files are written by a background
+thread, the views only hand the finished game over.
+
+Layout of the history file:
+    header  6 bytes   b"SOLS", version, 0
+    games   19 bytes per game: finish time, deal number (uint32), hard
+            mode, language, won (uint8), seconds (float), moves (uint32)
+
+If the summary is missing or behind the history (the game was closed
+before it was written), it is worked out again from the history once. A
+history that cannot be read is renamed to history.bin.bad and the
+statistics start again.
+'''
+
+import json
+import os
+import queue
+import struct
+import threading
+import time
+from resources import user_data_path
+
+MAGIC = b"SOLS"
+VERSION = 1
+HEADER = struct.Struct("<4sBB")
+RECORD = struct.Struct("<IIBBBfI")
+
+LANGUAGES = ["EN", "RO"]
+MODES = ["normal", "hard"]
+
+
+def new_totals():
+    '''Return the totals of a mode with no game played'''
+    return {'games': 0, 'wins': 0, 'best_time': None, 'best_moves': None, 'streak': 0, 'best_streak': 0}
+
+
+def add_game(totals, won, seconds, moves):
+    '''Count a finished game in the totals of its mode'''
+    totals['games'] += 1
+    if not won:
+        totals['streak'] = 0
+        return
+    totals['wins'] += 1
+    totals['streak'] += 1
+    totals['best_streak'] = max(totals['best_streak'], totals['streak'])
+    if totals['best_time'] is None or seconds < totals['best_time']:
+        totals['best_time'] = seconds
+    if totals['best_moves'] is None or moves < totals['best_moves']:
+        totals['best_moves'] = moves
+
+
+class StatsStore:
+    '''History of the games played and the totals of every mode'''
+
+    def __init__(self, folder):
+        '''Read the totals, and start the thread that writes the files'''
+        self.history_path = os.path.join(folder, "history.bin")
+        self.summary_path = os.path.join(folder, "summary.json")
+        self.totals = self.load_totals()
+
+        # Games and totals waiting to be written, None stops the writer
+        self.pending = queue.Queue()
+        self.writer = threading.Thread(target=self.write_games, name="stats writer", daemon=True)
+        self.writer.start()
+
+    def history_count(self):
+        '''Return the number of games in the history file'''
+        if not os.path.exists(self.history_path):
+            return 0
+        return max(os.path.getsize(self.history_path) - HEADER.size, 0) // RECORD.size
+
+    def load_totals(self):
+        '''Return the totals of the summary, or of the whole history if the summary is behind'''
+        try:
+            with open(self.summary_path) as summary_file:
+                summary = json.load(summary_file)
+            if summary['version'] == VERSION and summary['count'] == self.history_count():
+                return summary['modes']
+        except (OSError, ValueError, KeyError):
+            pass
+        totals = {mode: new_totals() for mode in MODES}
+        try:
+            history = self.read_history()
+        except (ValueError, struct.error):
+            # A history that cannot be read is kept aside, the statistics start again
+            os.replace(self.history_path, self.history_path + ".bad")
+            return totals
+        for _, _, hard_mode, _, won, seconds, moves in history:
+            add_game(totals[MODES[hard_mode]], won, seconds, moves)
+        return totals
+
+    def read_history(self):
+        '''Return every game of the history, the oldest first'''
+        if not os.path.exists(self.history_path):
+            return []
+        with open(self.history_path, "rb") as history_file:
+            data = history_file.read()
+        magic, version, _ = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.history_path} is not a statistics file")
+        # A game cut short while being written is left out
+        end = HEADER.size + (len(data) - HEADER.size) // RECORD.size * RECORD.size
+        return list(RECORD.iter_unpack(data[HEADER.size:end]))
+
+    def record(self, deal_number, hard_mode: bool, language, won: bool, seconds, moves):
+        '''Count a game won or left, it is written to disk in the background'''
+        add_game(self.totals[MODES[hard_mode]], won, seconds, moves)
+        record = RECORD.pack(int(time.time()), deal_number & 0xFFFFFFFF, hard_mode,
+                             LANGUAGES.index(language), won, seconds, moves)
+        self.pending.put((record, {mode: dict(totals) for mode, totals in self.totals.items()}))
+
+    def write_games(self):
+        '''Append the games to the history and write the totals, in the writer thread'''
+        count = self.history_count()
+        with open(self.history_path, "ab") as history_file:
+            if history_file.tell() == 0:
+                history_file.write(HEADER.pack(MAGIC, VERSION, 0))
+            stop = False
+            while not stop:
+                # Every game waiting is written, with the totals after the last one
+                games = [self.pending.get()]
+                while not self.pending.empty():
+                    games.append(self.pending.get())
+                stop = None in games
+                games = [game for game in games if game is not None]
+                if not games:
+                    continue
+                for record, _ in games:
+                    history_file.write(record)
+                history_file.flush()
+                count += len(games)
+                self.write_summary(count, games[-1][1])
+
+    def write_summary(self, count, modes):
+        '''Replace the summary file, it is never left half written'''
+        temporary_path = self.summary_path + ".tmp"
+        with open(temporary_path, "w") as summary_file:
+            json.dump({'version': VERSION, 'count': count, 'modes': modes}, summary_file)
+        os.replace(temporary_path, self.summary_path)
+
+    def close(self):
+        '''Write the games waiting and stop the writer'''
+        self.pending.put(None)
+        self.writer.join()
+
+
+# Statistics of the player, opened by the preloader thread before the
+# views need them
+_store = None
+_store_lock = threading.Lock()
+
+
+def open_stats():
+    '''Return the statistics of the player'''
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StatsStore(os.path.dirname(user_data_path("stats", "history.bin")))
+        return _store
+
+
+def close_stats():
+    '''Write the games waiting, if the statistics were opened'''
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
@@ -0,0 +1,71 @@
+'''
+Cards sliding across the table
+
+Where every card slides from and to, when it starts and how long it takes
+are kept in NumPy arrays indexed by card, so one update moves all the
+cards at once: dealing 28 cards costs the same single step as moving one.
+Tweens follow the time passed, not the frames drawn, so a slow frame
+makes the cards jump ahead instead of slowing them down.
+'''
+
+import numpy as np
+from model import CARD_CODES
+
+
+class CardTweens:
+    '''Cards moving to a position, updated all at once'''
+
+    def __init__(self, capacity: int = CARD_CODES):
+        '''Create the arrays, no card is moving'''
+        self.start = np.zeros((capacity, 2))
+        self.end = np.zeros((capacity, 2))
+        self.start_time = np.zeros(capacity)
+        self.duration = np.ones(capacity)
+        self.moving = np.zeros(capacity, dtype=bool)
+
+        # Sprite of every card moving, by card
+        self.cards = [None] * capacity
+
+        # Seconds since the tweens were created
+        self.clock = 0.0
+
+    @property
+    def active(self):
+        '''True while a card is moving'''
+        return bool(self.moving.any())
+
+    def add(self, card, position, duration: float, delay: float = 0.0):
+        '''Move a card from where it is to a position, after a delay'''
+        code = card.code
+        self.cards[code] = card
+        self.start[code] = card.position
+        self.end[code] = position
+        self.start_time[code] = self.clock + delay
+        self.duration[code] = duration
+        self.moving[code] = True
+
+    def update(self, delta_time: float):
+        '''Move all the cards, the ones that got where they were going stop'''
+        self.clock += delta_time
+        moving = np.flatnonzero(self.moving)
+        if len(moving) == 0:
+            return
+        progress = np.clip((self.clock - self.start_time[moving]) / self.duration[moving], 0, 1)
+        arrived = progress >= 1
+
+        # Fast at first, slowing down at the end
+        eased = 1 - (1 - progress) ** 3
+        start = self.start[moving]
+        positions = start + (self.end[moving] - start) * eased[:, None]
+        positions[arrived] = self.end[moving[arrived]]
+        for code, (x, y) in zip(moving.tolist(), positions.tolist()):
+            self.cards[code].position = x, y
+
+        self.moving[moving[arrived]] = False
+
+    def finish(self):
+        '''Put every moving card where it is going'''
+        moving = np.flatnonzero(self.moving)
+        for code, (x, y) in zip(moving.tolist(), self.end[moving].tolist()):
+            self.cards[code].position = x, y
+        self.moving[:] = False
@@ -0,0 +1,44 @@
+import json
+import os
+from PIL import Image
+
+# Card folders and names, in the same order as CARD_SUITS and CARD_VALUES
+suits = ['hearts', 'diamonds', 'clubs', 'spades']
+values = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
+
+# Empty pixels around every card so neighbours never bleed into each other
+padding = 2
+
+def build_atlas(sprites_folder, output_folder):
+    # One row per suit and a last row for the cover
+    names = [f'{suit}/{value}' for suit in suits for value in values]
+    names.append('cover/cover')
+
+    images = {}
+    for name in names:
+        images[name] = Image.open(os.path.join(sprites_folder, f'{name}.jpg')).convert('RGB')
+
+    # All the cards have the same size
+    card_width, card_height = images['cover/cover'].size
+    cell_width = card_width + 2 * padding
+    cell_height = card_height + 2 * padding
+    columns = len(values)
+    rows = len(suits) + 1
+
+    atlas = Image.new('RGB', (columns * cell_width, rows * cell_height))
+    rects = {}
+    for i, name in enumerate(names):
+        x = (i % columns) * cell_width + padding
+        y = (i // columns) * cell_height + padding
+        atlas.paste(images[name], (x, y))
+        # Rectangles use the image origin (top left), like arcade.load_texture
+        rects[name] = [x, y, card_width, card_height]
+
+    os.makedirs(output_folder, exist_ok=True)
+    atlas.save(os.path.join(output_folder, 'cards.png'), optimize=True)
+    with open(os.path.join(output_folder, 'cards.json'), 'w') as index_file:
+        json.dump({'image': 'cards.png', 'cards': rects}, index_file)
+    print(f'Packed {len(names)} cards into {os.path.join(output_folder, "cards.png")}')
+
+# Run it from the root of the repository, before building with PyInstaller
+build_atlas('./sprites', './sprites/atlas')